@@ -1,9 +1,10 @@
 import os
+import posixpath
 import shutil
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
 from src.utils import set_file_creation_time, load_config
 
 # Setup
@@ -11,25 +12,61 @@ logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("1979Fixer")
 
 CONFIG = load_config("config/settings.yaml")
-TARGET_ROOT = CONFIG['organization']['target_root']
+TARGET_ROOT = CONFIG['organization']['target_root'].replace('\\', '/') # Forward slashes once, not per file
 DRY_RUN = False #-- Change to False to apply fixes
+MAX_WORKERS = 32 # Per-file stat/move work is I/O bound, so threads overlap well (esp. on NAS)
 
 # Threshold: Jan 2, 1980 (Avoids timezone edge cases around the 1980 epoch)
 MIN_VALID_TIMESTAMP = 315619200.0 
 
-def fix_file(file_path):
-    path = Path(file_path)
+# Leading "YYYY-MM-DD" date prefix on organized filenames
+_DATE_PREFIX_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+# Target folders already created this run (skips repeated makedirs syscalls)
+_CREATED_DIRS = set()
+
+# Source folders files were moved out of (rmdir'd in bulk after the walk)
+_TOUCHED_PARENTS = set()
+
+# Filenames carrying one of the broken epoch dates, matched in one regex pass
+# (add new broken prefixes to the tuple as they turn up)
+BAD_DATE_PREFIXES = ("1979-", "1980-01-01")
+BAD_DATE_RE = re.compile("|".join(map(re.escape, BAD_DATE_PREFIXES)))
+
+def iter_dirs(root):
+    # Iterative scandir walk: yields (folder, file DirEntries) so the cached
+    # type/stat info is reused and per-folder checks run once per directory
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        files = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                    else:
+                        files.append(entry)
+        except OSError:
+            continue
+        yield current, files
+
+def fix_file(file_path, stat=None):
+    name = os.path.basename(file_path)
+    parent = os.path.dirname(file_path)
     
-    # 1. Get current metadata
+    # 1. Get current metadata (reuse the scandir stat when the walker provides it)
     try:
-        stat = path.stat()
+        if stat is None:
+            stat = os.stat(file_path)
         mtime = stat.st_mtime
     except OSError:
         return
 
     # 2. Check if Modified Date is valid (newer than 1980)
     if mtime < MIN_VALID_TIMESTAMP:
-        logger.warning(f"[SKIP] Modified date is also ancient/invalid: {path.name}")
+        logger.warning(f"[SKIP] Modified date is also ancient/invalid: {name}")
         return
 
     # 3. Calculate New Path
@@ -40,54 +77,74 @@ def fix_file(file_path):
     
     # Update filename prefix (swap 1979-XX-XX with 2024-XX-XX)
     # Regex looks for start of string date
-    new_name = re.sub(r'^\d{4}-\d{2}-\d{2}', date_prefix, path.name)
+    new_name = _DATE_PREFIX_RE.sub(date_prefix, name)
     
-    relative_path = os.path.join(year_folder, month_folder, new_name)
-    new_full_path = os.path.join(TARGET_ROOT, relative_path).replace('\\', '/')
+    new_full_path = posixpath.join(TARGET_ROOT, year_folder, month_folder, new_name)
     
-    if str(path).replace('\\', '/') == new_full_path:
+    # Only Windows hands back backslashes from scandir
+    posix_path = file_path if os.sep == '/' else file_path.replace(os.sep, '/')
+    if posix_path == new_full_path:
         return # No change needed
 
-    logger.info(f"FIXING: {path.name}")
-    logger.info(f"  Move: .../{path.parent.name}/{path.name} -> .../{month_folder}/{new_name}")
+    logger.info(f"FIXING: {name}")
+    logger.info(f"  Move: .../{os.path.basename(parent)}/{name} -> .../{month_folder}/{new_name}")
     
     if not DRY_RUN:
         try:
             # Create dirs
-            os.makedirs(os.path.dirname(new_full_path), exist_ok=True)
+            target_dir = os.path.dirname(new_full_path)
+            if target_dir not in _CREATED_DIRS:
+                os.makedirs(target_dir, exist_ok=True)
+                _CREATED_DIRS.add(target_dir)
             
-            # Move
-            shutil.move(str(path), new_full_path)
+            # Move (plain rename on the same drive, shutil handles cross-device)
+            try:
+                os.replace(file_path, new_full_path)
+            except OSError:
+                shutil.move(file_path, new_full_path)
             
             # Fix Metadata (Set Creation to match Modified, since Modified is the only truth we have)
             set_file_creation_time(new_full_path, mtime)
             
-            # Remove old empty dir if empty
-            try:
-                os.rmdir(path.parent) 
-            except OSError:
-                pass # Directory not empty
+            # Old folder may now be empty; cleaned up once at the end of main()
+            _TOUCHED_PARENTS.add(parent)
                 
         except Exception as e:
             logger.error(f"Failed: {e}")
 
+def fix_entry(entry):
+    try:
+        stat = entry.stat()
+    except OSError:
+        return
+    fix_file(entry.path, stat)
+
 def main():
     if not os.path.exists(TARGET_ROOT):
         return
 
     logger.info(f"Scanning {TARGET_ROOT} for 1979/1980 artifacts...")
     
-    for root, dirs, files in os.walk(TARGET_ROOT):
-        # We only care about folders that look like dates "1979" or "1980"
-        # Check current folder name
-        current_folder = os.path.basename(root)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = []
+        for folder, files in iter_dirs(TARGET_ROOT):
+            # We only care about files that look like dates "1979" or "1980",
+            # or files sitting inside a '1979' folder
+            folder_is_1979 = "1979" in os.path.basename(folder)
+            
+            for entry in files:
+                if folder_is_1979 or BAD_DATE_RE.match(entry.name):
+                    futures.append(pool.submit(fix_entry, entry))
         
-        # If we are inside a '1979' or '1980' folder, or the file starts with it
-        for file in files:
-            if file.startswith("1979-") or file.startswith("1980-01-01"):
-                fix_file(os.path.join(root, file))
-            elif "1979" in current_folder:
-                fix_file(os.path.join(root, file))
+        for future in futures:
+            future.result()
+
+    # Remove emptied source folders, deepest first
+    for folder in sorted(_TOUCHED_PARENTS, key=lambda p: -p.replace('\\', '/').count('/')):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass # Directory not empty
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
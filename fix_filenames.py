@@ -1,6 +1,7 @@
 import os
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from src.utils import load_config
 
@@ -9,10 +10,12 @@ logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("Cleaner")
 
 CONFIG_PATH = "config/settings.yaml"
+MAX_WORKERS = 16
 
 # Regex to find the recursive artifact: "_from_" followed by "YYYY-MM"
 # matches: _from_2024-01, _from_2022-12, etc.
-RECURSIVE_PATTERN = re.compile(r'_from_\d{4}-\d{2}')
+# Leading underscores are swallowed too, so one pass leaves no "__" behind
+RECURSIVE_PATTERN = re.compile(r'_+from_\d{4}-\d{2}')
 
 def main():
     if not os.path.exists(CONFIG_PATH):
@@ -31,32 +34,35 @@ def main():
     renamed_count = 0
     errors = 0
 
-    # Walk the directory tree
+    # Collect (old_path, new_path, filename, new_filename) before touching anything
+    pairs = []
     for root, dirs, files in os.walk(target_root):
         for filename in files:
-            # Check if file has the artifact
-            if RECURSIVE_PATTERN.search(filename):
+            # Remove all instances of the pattern (no match -> nothing to fix)
+            new_filename, hits = RECURSIVE_PATTERN.subn('', filename)
+            if hits:
+                # Clean up any remaining double underscores (rare now that the pattern eats them)
+                if '__' in new_filename:
+                    new_filename = new_filename.replace('__', '_')
                 
-                old_path = os.path.join(root, filename)
-                
-                # Remove all instances of the pattern
-                new_filename = RECURSIVE_PATTERN.sub('', filename)
-                
-                # Clean up potential double underscores left behind (e.g. Name__from_Source)
-                new_filename = new_filename.replace('__', '_')
-                
-                new_path = os.path.join(root, new_filename)
-                
-                try:
-                    # Windows Long Path handling (if needed)
-                    # if len(old_path) > 260: old_path = "\\\\?\\" + os.path.abspath(old_path)
-                    
-                    os.rename(old_path, new_path)
-                    logger.info(f"[FIXED] {filename} -> {new_filename}")
-                    renamed_count += 1
-                except OSError as e:
-                    logger.error(f"Failed to rename {filename}: {e}")
-                    errors += 1
+                # Windows Long Path handling (if needed)
+                # if len(old_path) > 260: old_path = "\\\\?\\" + os.path.abspath(old_path)
+                pairs.append((os.path.join(root, filename), os.path.join(root, new_filename),
+                              filename, new_filename))
+
+    # Renames are independent and I/O bound; log from this thread only
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(os.rename, old, new): (filename, new_filename)
+                   for old, new, filename, new_filename in pairs}
+        for future in as_completed(futures):
+            filename, new_filename = futures[future]
+            try:
+                future.result()
+                logger.info(f"[FIXED] {filename} -> {new_filename}")
+                renamed_count += 1
+            except OSError as e:
+                logger.error(f"Failed to rename {filename}: {e}")
+                errors += 1
 
     logger.info(f"Cleanup complete. Fixed {renamed_count} files. Errors: {errors}")
 
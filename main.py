@@ -3,6 +3,7 @@
 import argparse
 import logging
 import os
+import sqlite3
 from typing import Any
 
 from src.utils import load_config, setup_logger, normalize_path
@@ -45,16 +46,20 @@ def main() -> None:
     
     db_path = config['app']['db_name']
 
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-            logger.info("Previous database cleared for fresh run.")
-        except OSError as e:
-            logger.error(f"Could not clear database: {e}")
-            return
-
     db = DatabaseManager(db_path)
-    db.initialize_schema()
+    had_previous = os.path.exists(db_path)
+    try:
+        # Clear the previous run in place: keeps the file, its WAL and page
+        # cache instead of deleting and re-creating the database
+        db.wipe_db()
+        db.initialize_schema()
+    except sqlite3.Error as e:
+        logger.error(f"Could not clear database: {e}")
+        db.close()
+        return
+    
+    if had_previous:
+        logger.info("Previous database cleared for fresh run.")
     
     scan_roots: list[str] = []
     
@@ -73,158 +78,135 @@ def main() -> None:
         cfg_sources = config['organization'].get('source_dirs', [])
         scan_roots.extend(cfg_sources)
         
-    scan_roots = list(set(scan_roots))
+    scan_roots = list(dict.fromkeys(scan_roots))
 
     logger.info("=== Media Consolidator Started ===")
     logger.info(f"Target Root: {target_root}")
     logger.info(f"Scan Scope: {scan_roots}")
 
-    if args.command == "all":
-        run_scan(db, config, scan_roots, logger)
-        run_hash(db, config, logger)
-        run_analyze(db, config, logger)
-        run_plan(db, config, logger)
+    pipeline = Pipeline(db, config, logger)
+    try:
+        if args.command == "all":
+            pipeline.scan(scan_roots)
+            pipeline.hash()
+            pipeline.analyze()
+            pipeline.plan()
         
-        if perform_audit(db, logger):
-            run_exec(db, config, not args.live, logger)
-        else:
-            logger.error("AUDIT FAILED. Aborting.")
+            if pipeline.audit():
+                pipeline.execute(dry_run=not args.live)
+            else:
+                logger.error("AUDIT FAILED. Aborting.")
             
-    elif args.command == "scan":
-        run_scan(db, config, scan_roots, logger)
-    elif args.command == "hash":
-        run_hash(db, config, logger)
-    elif args.command == "analyze":
-        run_analyze(db, config, logger)
-    elif args.command == "plan":
-        run_plan(db, config, logger)
-    elif args.command == "execute":
-        run_exec(db, config, not args.live, logger)
-    else:
-        parser.print_help()
-
-
-def run_scan(
-    db: DatabaseManager,
-    config: dict[str, Any],
-    roots: list[str],
-    logger: logging.Logger,
-) -> None:
-    """Scan specified root directories and index media files.
-    
-    Args:
-        db: Database manager instance.
-        config: Configuration dictionary.
-        roots: List of root directories to scan.
-        logger: Logger instance.
-    """
-    crawler = FileCrawler(db, config)
-    count = crawler.scan_roots(roots)
-    logger.info(f"File scan complete. Indexed {count} files.")
-
-
-def run_hash(
-    db: DatabaseManager,
-    config: dict[str, Any],
-    logger: logging.Logger,
-) -> None:
-    """Generate fingerprints for indexed files.
-    
-    Args:
-        db: Database manager instance.
-        config: Configuration dictionary.
-        logger: Logger instance.
-    """
-    hasher = Fingerprinter(db, config)
-    hasher.process_database()
-    logger.info("Fingerprinting complete.")
+        elif args.command == "scan":
+            pipeline.scan(scan_roots)
+        elif args.command == "hash":
+            pipeline.hash()
+        elif args.command == "analyze":
+            pipeline.analyze()
+        elif args.command == "plan":
+            pipeline.plan()
+        elif args.command == "execute":
+            pipeline.execute(dry_run=not args.live)
+        else:
+            parser.print_help()
+    finally:
+        db.close()
 
 
-def run_analyze(
-    db: DatabaseManager,
-    config: dict[str, Any],
-    logger: logging.Logger,
-) -> None:
-    """Analyze file metadata and identify duplicates.
+class Pipeline:
+    """Run the consolidation phases against one database and configuration.
     
-    Args:
-        db: Database manager instance.
-        config: Configuration dictionary.
-        logger: Logger instance.
+    Holds the shared database manager, configuration, and logger so each
+    phase runner does not need them passed in again.
     """
-    analyzer = Analyzer(db, config)
-    analyzer.process_metadata()
-    analyzer.process_duplicates()
-    logger.info("Analysis complete.")
-
-
-def run_plan(
-    db: DatabaseManager,
-    config: dict[str, Any],
-    logger: logging.Logger,
-) -> None:
-    """Generate file organization plan.
-    
-    Args:
-        db: Database manager instance.
-        config: Configuration dictionary.
-        logger: Logger instance.
-    """
-    librarian = Librarian(db, config)
-    librarian.generate_organization_plan()
-    logger.info("Organization plan generated.")
 
-
-def perform_audit(db: DatabaseManager, logger: logging.Logger) -> bool:
-    """Verify that all files have valid dispositions before execution.
-    
-    Args:
-        db: Database manager instance.
-        logger: Logger instance.
+    def __init__(
+        self,
+        db: DatabaseManager,
+        config: dict[str, Any],
+        logger: logging.Logger,
+    ) -> None:
+        """Initialize the pipeline.
         
-    Returns:
-        True if audit passes, False otherwise.
-    """
-    logger.info("--- PRE-FLIGHT SANITY CHECK ---")
-    with db.get_connection() as conn:
-        total = conn.execute("SELECT COUNT(*) FROM media_files").fetchone()[0]
-        keeps = conn.execute("SELECT COUNT(*) FROM media_files WHERE disposition='KEEP'").fetchone()[0]
-        deletes = conn.execute("SELECT COUNT(*) FROM media_files WHERE disposition='DELETE'").fetchone()[0]
-        unhandled = conn.execute("SELECT COUNT(*) FROM media_files WHERE disposition IS NULL").fetchone()[0]
-    
-    logger.info(f"Total Files: {total}")
-    logger.info(f"To Keep:     {keeps}")
-    logger.info(f"To Trash:    {deletes}")
-    
-    if unhandled > 0:
-        logger.error(f"AUDIT FAIL: {unhandled} files have no disposition!")
-        return False
+        Args:
+            db: Database manager instance.
+            config: Configuration dictionary.
+            logger: Logger instance.
+        """
+        self.db = db
+        self.config = config
+        self.logger = logger
+
+    def scan(self, roots: list[str]) -> None:
+        """Scan specified root directories and index media files.
         
-    if (keeps + deletes) != total:
-        logger.error("AUDIT FAIL: Keep + Trash does not equal Total!")
-        return False
+        Args:
+            roots: List of root directories to scan.
+        """
+        crawler = FileCrawler(self.db, self.config)
+        count = crawler.scan_roots(roots)
+        self.logger.info(f"File scan complete. Indexed {count} files.")
+
+    def hash(self) -> None:
+        """Generate fingerprints for indexed files."""
+        hasher = Fingerprinter(self.db, self.config)
+        hasher.process_database()
+        self.logger.info("Fingerprinting complete.")
+
+    def analyze(self) -> None:
+        """Analyze file metadata and identify duplicates."""
+        analyzer = Analyzer(self.db, self.config)
+        analyzer.process_metadata()
+        analyzer.process_duplicates()
+        self.logger.info("Analysis complete.")
+
+    def plan(self) -> None:
+        """Generate file organization plan."""
+        librarian = Librarian(self.db, self.config)
+        librarian.generate_organization_plan()
+        self.logger.info("Organization plan generated.")
+
+    def audit(self) -> bool:
+        """Verify that all files have valid dispositions before execution.
         
-    logger.info("AUDIT PASS: All files accounted for.")
-    return True
-
+        Returns:
+            True if audit passes, False otherwise.
+        """
+        self.logger.info("--- PRE-FLIGHT SANITY CHECK ---")
+        sql = """
+        SELECT COUNT(*),
+               COALESCE(SUM(disposition = 'KEEP'), 0),
+               COALESCE(SUM(disposition = 'DELETE'), 0),
+               COALESCE(SUM(disposition IS NULL), 0)
+        FROM media_files
+        """
+        with self.db.get_connection() as conn:
+            total, keeps, deletes, unhandled = conn.execute(sql).fetchone()
+        
+        self.logger.info(f"Total Files: {total}")
+        self.logger.info(f"To Keep:     {keeps}")
+        self.logger.info(f"To Trash:    {deletes}")
+        
+        if unhandled > 0:
+            self.logger.error(f"AUDIT FAIL: {unhandled} files have no disposition!")
+            return False
+            
+        if (keeps + deletes) != total:
+            self.logger.error("AUDIT FAIL: Keep + Trash does not equal Total!")
+            return False
+            
+        self.logger.info("AUDIT PASS: All files accounted for.")
+        return True
 
-def run_exec(
-    db: DatabaseManager,
-    config: dict[str, Any],
-    dry_run: bool,
-    logger: logging.Logger,
-) -> None:
-    """Execute file organization plan.
-    
-    Args:
-        db: Database manager instance.
-        config: Configuration dictionary.
-        dry_run: If True, simulate execution without moving files.
-        logger: Logger instance.
-    """
-    executioner = Executioner(db, config, dry_run=dry_run)
-    executioner.execute()
-    logger.info("Execution complete.")
+    def execute(self, dry_run: bool) -> None:
+        """Execute file organization plan.
+        
+        Args:
+            dry_run: If True, simulate execution without moving files.
+        """
+        executioner = Executioner(self.db, self.config, dry_run=dry_run)
+        executioner.execute()
+        self.logger.info("Execution complete.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,7 +2,7 @@ import sqlite3
 import os
 import logging
 from collections import defaultdict
-from pathlib import Path
+from functools import lru_cache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -11,6 +11,11 @@ logger = logging.getLogger("TraceMaker")
 DB_PATH = "media_index.db"
 TRACE_FILENAME = "image_trace.txt"
 
+@lru_cache(maxsize=None)
+def _dir_exists(path):
+    # Source folders repeat across rebuilds; memoize the stat per folder
+    return os.path.isdir(path)
+
 def main():
     if not os.path.exists(DB_PATH):
         logger.error(f"Database {DB_PATH} not found! Did you run a new scan already?")
@@ -24,38 +29,37 @@ def main():
     receipts = defaultdict(list)
     
     with sqlite3.connect(DB_PATH) as conn:
+        # Stream both passes inside one read transaction (consistent snapshot,
+        # no intermediate row lists)
+        conn.execute("BEGIN")
+        
         # 1. Get KEEP files (Direct mapping)
-        cursor = conn.execute("SELECT file_path, target_path FROM media_files WHERE disposition='KEEP'")
-        keepers = cursor.fetchall()
+        # Also index where each survivor went by hash for the duplicate pass
+        keep_by_hash = {}
+        sql_keepers = "SELECT file_path, target_path, hash_full FROM media_files WHERE disposition='KEEP'"
         
-        for src, dst in keepers:
+        for src, dst, hash_full in conn.execute(sql_keepers):
             if not dst: continue # Should not happen if run completed
             
-            src_path = Path(src)
-            parent_folder = str(src_path.parent)
+            if hash_full is not None:
+                keep_by_hash[hash_full] = dst
+            
+            parent_folder = os.path.dirname(src)
             
-            line = f"[MOVED] '{src_path.name}' -> '{dst}'"
+            line = f"[MOVED] '{os.path.basename(src)}' -> '{dst}'"
             receipts[parent_folder].append(line)
             
         # 2. Get DELETE files (Map to their 'Keeper' twin)
-        # We join the table on itself matching Hash to find where the survivor went
-        sql_dupes = """
-        SELECT t1.file_path, t2.target_path 
-        FROM media_files t1
-        JOIN media_files t2 ON t1.hash_full = t2.hash_full
-        WHERE t1.disposition = 'DELETE' 
-          AND t2.disposition = 'KEEP'
-        """
-        cursor = conn.execute(sql_dupes)
-        dupes = cursor.fetchall()
+        # Single pass with a hash lookup (avoids a self-join on hash_full)
+        sql_dupes = "SELECT file_path, hash_full FROM media_files WHERE disposition='DELETE'"
         
-        for src, dst in dupes:
+        for src, hash_full in conn.execute(sql_dupes):
+            dst = keep_by_hash.get(hash_full)
             if not dst: continue
             
-            src_path = Path(src)
-            parent_folder = str(src_path.parent)
+            parent_folder = os.path.dirname(src)
             
-            line = f"[DUPLICATE CONSOLIDATED] '{src_path.name}' -> '{dst}'"
+            line = f"[DUPLICATE CONSOLIDATED] '{os.path.basename(src)}' -> '{dst}'"
             receipts[parent_folder].append(line)
 
     # 3. Write the receipts
@@ -69,7 +73,7 @@ def main():
     count_lines = 0
     for folder, lines in receipts.items():
         # Ensure the folder still exists (it should, we don't delete folders)
-        if not os.path.exists(folder):
+        if not _dir_exists(folder):
             logger.warning(f"Skipping missing folder: {folder}")
             continue
             
@@ -78,11 +82,11 @@ def main():
         try:
             # Append mode ('a') in case we run this multiple times, 
             # or 'w' to overwrite? 'a' is safer for history.
+            # Build the whole receipt up front and write it in one call
+            body = "\n".join(lines)
             with open(trace_path, "w", encoding="utf-8") as f:
-                f.write(f"--- Media Consolidator Run ({len(lines)} files) ---\n")
-                for line in lines:
-                    f.write(line + "\n")
-                    count_lines += 1
+                f.write(f"--- Media Consolidator Run ({len(lines)} files) ---\n{body}\n")
+            count_lines += len(lines)
             count += 1
         except Exception as e:
             logger.error(f"Failed to write trace to {folder}: {e}")
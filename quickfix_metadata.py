@@ -4,14 +4,18 @@ import sys
 import logging
 import time
 import random
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from ctypes import windll, wintypes, byref
+from ctypes import windll, wintypes, byref, POINTER
 
 # --- CONFIG ---
 TARGET_ROOT = "C:/OrganizedPhotos"
 TRASH_NAME = "_TRASH"
 DRY_RUN = False
+MAX_WORKERS = 32  # Win32 calls release the GIL, so per-file fixes run concurrently
+BATCH_SIZE = 1024 # Files handed to the pool at a time (bounds pending futures)
 # --------------
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -19,32 +23,58 @@ logger = logging.getLogger("MetaFixer")
 
 DATE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
 
+GENERIC_WRITE = 0x40000000
+OPEN_EXISTING = 3
+FILE_ATTRIBUTE_NORMAL = 0x80
+INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+# Bind the Win32 entry points once with explicit prototypes so ctypes skips
+# the per-call attribute lookup and argument type guessing
+_CreateFileW = windll.kernel32.CreateFileW
+_CreateFileW.argtypes = [
+    wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+    wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE,
+]
+_CreateFileW.restype = wintypes.HANDLE
+
+_SetFileTime = windll.kernel32.SetFileTime
+_SetFileTime.argtypes = [
+    wintypes.HANDLE, POINTER(wintypes.FILETIME),
+    POINTER(wintypes.FILETIME), POINTER(wintypes.FILETIME),
+]
+_SetFileTime.restype = wintypes.BOOL
+
+_CloseHandle = windll.kernel32.CloseHandle
+_CloseHandle.argtypes = [wintypes.HANDLE]
+_CloseHandle.restype = wintypes.BOOL
+
 def get_windows_handle(path):
-    GENERIC_WRITE = 0x40000000
-    OPEN_EXISTING = 3
-    FILE_ATTRIBUTE_NORMAL = 0x80
-    hfile = windll.kernel32.CreateFileW(
+    hfile = _CreateFileW(
         path, GENERIC_WRITE, 0, None, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, None
     )
-    if hfile == -1: return None
+    if hfile is None or hfile == INVALID_HANDLE_VALUE: return None
     return hfile
 
 def set_creation_time(path, timestamp):
     wintime = int((timestamp * 10000000) + 116444736000000000)
-    ft = wintypes.FILETIME()
-    ft.dwLowDateTime = wintime & 0xFFFFFFFF
-    ft.dwHighDateTime = wintime >> 32
+    # FILETIME stays per call: worker threads would race on a shared struct
+    ft = wintypes.FILETIME(wintime & 0xFFFFFFFF, wintime >> 32)
     handle = get_windows_handle(path)
     if not handle: return False
-    result = windll.kernel32.SetFileTime(handle, byref(ft), None, None)
-    windll.kernel32.CloseHandle(handle)
+    result = _SetFileTime(handle, byref(ft), None, None)
+    _CloseHandle(handle)
     return result != 0
 
+@lru_cache(maxsize=None)
+def noon_timestamp(y, m, d):
+    # Files cluster heavily by date, so build each day's local-noon timestamp once
+    return datetime(y, m, d, 12, 0, 0).timestamp()
+
 def is_time_midnight(timestamp):
     dt = datetime.fromtimestamp(timestamp)
     return dt.hour == 0 and dt.minute == 0 and dt.second == 0
 
-def process_file(path_str):
+def process_file(path_str, stat=None):
     path = Path(path_str)
     filename = path.name
     
@@ -55,15 +85,13 @@ def process_file(path_str):
     
     try:
         # 1. Calculate Jittered Target (Noon +/- 4 hours)
-        base_dt = datetime(y, m, d, 12, 0, 0)
-        jitter_seconds = random.randint(-14400, 14400)
-        final_dt = base_dt + timedelta(seconds=jitter_seconds)
-        jittered_ts = final_dt.timestamp()
+        jittered_ts = noon_timestamp(y, m, d) + random.randint(-14400, 14400)
     except ValueError:
         return 
 
     try:
-        stat = path.stat()
+        if stat is None:
+            stat = path.stat()
         current_mtime = stat.st_mtime
         current_atime = stat.st_atime
         current_ctime = getattr(stat, 'st_birthtime', stat.st_ctime)
@@ -127,6 +155,32 @@ def process_file(path_str):
                 else:
                     logger.error("  [FAILED] Win32 API Error.")
 
+def iter_files(root):
+    # Iterative scandir walk, pruning the trash folder
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if entry.name != TRASH_NAME and not entry.is_symlink():
+                            stack.append(entry.path)
+                    else:
+                        yield entry
+        except OSError:
+            continue
+
+def process_entry(entry):
+    # Cheap name check first; only matching files pay for a stat, and the
+    # DirEntry stat is already cached from the directory listing on Windows
+    if not DATE_PATTERN.match(entry.name): return
+    try:
+        stat = entry.stat()
+    except OSError:
+        return
+    process_file(entry.path, stat)
+
 def main():
     if not os.path.exists(TARGET_ROOT):
         logger.error(f"Target root not found: {TARGET_ROOT}")
@@ -135,14 +189,16 @@ def main():
     logger.info(f"Scanning {TARGET_ROOT}...")
     
     count = 0
-    for root, dirs, files in os.walk(TARGET_ROOT):
-        if TRASH_NAME in dirs:
-            dirs.remove(TRASH_NAME)
-            
-        for file in files:
-            full_path = os.path.join(root, file)
-            process_file(full_path)
-            count += 1
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        batch = []
+        for entry in iter_files(TARGET_ROOT):
+            batch.append(entry)
+            if len(batch) >= BATCH_SIZE:
+                count += sum(1 for _ in pool.map(process_entry, batch))
+                batch = []
+        
+        if batch:
+            count += sum(1 for _ in pool.map(process_entry, batch))
             
     logger.info(f"Scanned {count} files.")
 
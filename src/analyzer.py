@@ -2,15 +2,217 @@
 
 import logging
 import os
+import re
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import groupby
+from operator import itemgetter
 from typing import Any
 
 from PIL import Image
 
 from src.db import DatabaseManager
-from src.utils import resolve_best_timestamp 
+from src.utils import MIN_VALID_TIMESTAMP, resolve_best_timestamp
 
 Image.MAX_IMAGE_PIXELS = None
 
+# Below this many images a process pool costs more to start than it saves
+_PARALLEL_EXIF_THRESHOLD = 200
+
+# "copy" (any case) or "(" in a file name marks it as a likely duplicate copy
+_DIRTY_NAME = re.compile(r'copy|\(', re.IGNORECASE).search
+
+# ROW_NUMBER() OVER needs SQLite 3.25+
+_HAS_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# Set-based version of Analyzer._judge_groups: rank every duplicate group by
+# metadata score, resolve_best_timestamp, filename cleanliness and path
+# length, then mark the first of each group KEEP and the rest DELETE.
+# The name is cut from the path by trimming everything after the last slash.
+_JUDGE_SQL = f"""
+WITH candidates AS (
+    SELECT id, hash_full, metadata_score, file_path,
+           CASE
+               WHEN created_at > {MIN_VALID_TIMESTAMP} AND modified_at > {MIN_VALID_TIMESTAMP}
+                   THEN MIN(created_at, modified_at)
+               WHEN created_at > {MIN_VALID_TIMESTAMP} THEN created_at
+               WHEN modified_at > {MIN_VALID_TIMESTAMP} THEN modified_at
+               ELSE MAX(created_at, modified_at)
+           END AS effective_date,
+           substr(file_path, length(rtrim(file_path,
+               replace(replace(file_path, '/', ''), '\\', ''))) + 1) AS file_name
+    FROM media_files
+    WHERE hash_full IN (
+        SELECT hash_full FROM media_files
+        WHERE hash_full IS NOT NULL
+        GROUP BY hash_full HAVING COUNT(*) > 1
+    )
+),
+ranked AS (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY hash_full
+        ORDER BY metadata_score DESC,
+                 effective_date ASC,
+                 (instr(lower(file_name), 'copy') > 0 OR instr(file_name, '(') > 0) ASC,
+                 length(file_path) ASC,
+                 id ASC
+    ) AS rn
+    FROM candidates
+)
+UPDATE media_files
+SET disposition = CASE WHEN id IN (SELECT id FROM ranked WHERE rn = 1)
+                       THEN 'KEEP' ELSE 'DELETE' END
+WHERE id IN (SELECT id FROM candidates)
+"""
+
+# Files still waiting for metadata analysis
+_PENDING_IMAGES = "analyzed = 0 AND file_ext IN ('.jpg', '.jpeg', '.png', '.heic', '.webp')"
+
+# Rows fetched, extracted and written per round of process_metadata
+_METADATA_PAGE_SIZE = 5000
+
+# IFD0 pointer tag to the Exif sub-IFD holding DateTimeOriginal
+_EXIF_IFD = 0x8769
+
+# JPEG EXIF lives in APP1 near the start of the file
+_EXIF_READ_SIZE = 64 * 1024
+
+
+def _read_ifd_tags(tiff: bytes, offset: int, endian: str, wanted: set[int]) -> dict[int, Any]:
+    """Read selected tags from one TIFF IFD.
+    
+    ASCII tags are decoded to strings; other tags return their raw value
+    field as an integer (used for IFD pointers).
+    
+    Args:
+        tiff: TIFF payload starting at the byte-order mark.
+        offset: Offset of the IFD within the payload.
+        endian: struct byte-order prefix ('<' or '>').
+        wanted: Tag ids to collect.
+        
+    Returns:
+        Mapping of the tags found to their values.
+    """
+    found: dict[int, Any] = {}
+    (count,) = struct.unpack_from(endian + "H", tiff, offset)
+    for i in range(count):
+        tag, typ, n, value = struct.unpack_from(endian + "HHII", tiff, offset + 2 + i * 12)
+        if tag not in wanted:
+            continue
+        if typ == 2:  # ASCII, stored inline when it fits in 4 bytes
+            start = offset + 2 + i * 12 + 8 if n <= 4 else value
+            found[tag] = tiff[start:start + n].split(b"\x00", 1)[0].decode("ascii", "replace")
+        else:
+            found[tag] = value
+    return found
+
+
+def _read_jpeg_exif(path: str) -> tuple[int, str | None] | None:
+    """Read the EXIF date straight from a JPEG's APP1 segment.
+    
+    Walks the JPEG markers in the first 64 KB and decodes only the IFD0
+    DateTime (306) and Exif DateTimeOriginal (36867) tags, without handing
+    the file to Pillow.
+    
+    Args:
+        path: File path to the JPEG.
+        
+    Returns:
+        Same tuple as _extract_exif, or None when the header could not be
+        settled from the bytes read and Pillow should decide instead.
+    """
+    with open(path, "rb") as f:
+        data = f.read(_EXIF_READ_SIZE)
+    
+    if data[:2] != b"\xff\xd8":
+        return None
+    
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # start of scan: no EXIF segment ahead of the image data
+            return 0, None
+        (seg_len,) = struct.unpack_from(">H", data, pos + 2)
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00":
+            end = pos + 2 + seg_len
+            if end > len(data):
+                return None
+            tiff = data[pos + 10:end]
+            endian = "<" if tiff[:2] == b"II" else ">"
+            (ifd0,) = struct.unpack_from(endian + "I", tiff, 4)
+            tags = _read_ifd_tags(tiff, ifd0, endian, {306, _EXIF_IFD})
+            if _EXIF_IFD in tags:
+                sub = _read_ifd_tags(tiff, tags[_EXIF_IFD], endian, {36867})
+                if sub.get(36867):
+                    return 1, sub[36867]
+            if tags.get(306):
+                return 1, tags[306]
+            return 0, None
+        pos += 2 + seg_len
+    return None
+
+
+def _init_exif_worker() -> None:
+    """Warm a process pool worker before it takes EXIF tasks.
+    
+    Registers every Pillow format plugin up front (Image.open otherwise does
+    it lazily on the first file it cannot identify) and lifts the pixel
+    limit, which spawned workers would not inherit from the parent.
+    """
+    Image.MAX_IMAGE_PIXELS = None
+    Image.init()
+
+
+def _extract_exif(path: str) -> tuple[int, str | None]:
+    """Extract EXIF date from an image file.
+    
+    Module-level so it can be pickled into process pool workers.
+    
+    Attempts to read EXIF data from the image, prioritizing the original
+    photo date (tag 36867) over general file date (tag 306). JPEGs are read
+    with a small header parser; other formats, and JPEGs it cannot settle,
+    go through Pillow.
+    
+    Args:
+        path: File path to the image.
+        
+    Returns:
+        A tuple of (has_exif: int, date_str: str | None) where has_exif
+        is 1 if EXIF date was found, 0 otherwise.
+    """
+    if path.lower().endswith((".jpg", ".jpeg")):
+        try:
+            result = _read_jpeg_exif(path)
+        except (OSError, struct.error, IndexError, UnicodeDecodeError):
+            result = None
+        if result is not None:
+            return result
+    
+    try:
+        with Image.open(path) as img:
+            # getexif() parses once and caches; DateTimeOriginal lives in the
+            # Exif sub-IFD, DateTime in IFD0
+            exif_data = img.getexif()
+            if not exif_data:
+                return 0, None
+            
+            date_str = exif_data.get_ifd(_EXIF_IFD).get(36867)
+            if date_str:
+                return 1, date_str
+            date_str = exif_data.get(306)
+            if date_str:
+                return 1, date_str
+            return 0, None
+    except Exception:
+        return 0, None
+
 
 class Analyzer:
     """Analyze media files and resolve duplicates based on metadata and timestamps.
@@ -45,31 +247,73 @@ class Analyzer:
         Scans image files (jpg, jpeg, png, heic, webp) and extracts EXIF data
         to assign metadata quality scores. Files with EXIF dates receive a score
         of 10, while files without receive 0.
+        
+        Pending files are read in id-ordered pages of _METADATA_PAGE_SIZE so
+        memory stays flat, and each page is written and committed before the
+        next is fetched.
         """
-        sql = """
+        sql_count = f"SELECT COUNT(*) FROM media_files WHERE {_PENDING_IMAGES}"
+        sql_page = f"""
         SELECT id, file_path FROM media_files 
-        WHERE analyzed = 0 AND file_ext IN ('.jpg', '.jpeg', '.png', '.heic', '.webp')
+        WHERE {_PENDING_IMAGES} AND id > ?
+        ORDER BY id LIMIT {_METADATA_PAGE_SIZE}
         """
         
-        updates: list[tuple[int, int, int]] = []
         with self.db.get_connection() as conn:
-            cursor = conn.execute(sql)
-            rows = cursor.fetchall()
+            total = conn.execute(sql_count).fetchone()[0]
+            if not total:
+                return
             
-            if rows:
-                self.logger.info(f"Analyzing metadata for {len(rows)} files...")
+            self.logger.info(f"Analyzing metadata for {total} files...")
             
-            for row_id, path in rows:
-                has_exif, _ = self._extract_exif(path)
-                score = 10 if has_exif else 0
-                updates.append((has_exif, score, row_id))
-
-            conn.executemany("""
-                UPDATE media_files 
-                SET has_exif_date = ?, metadata_score = ?, analyzed = 1 
-                WHERE id = ?
-            """, updates)
-            conn.commit()
+            if total > _PARALLEL_EXIF_THRESHOLD:
+                pool = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_exif_worker)
+            else:
+                pool = nullcontext()
+            with pool as executor:
+                last_id = 0
+                while rows := conn.execute(sql_page, (last_id,)).fetchall():
+                    last_id = rows[-1][0]
+                    paths = [path for _, path in rows]
+                    if executor:
+                        results = executor.map(_extract_exif, paths, chunksize=64)
+                    else:
+                        results = map(_extract_exif, paths)
+                    
+                    updates: list[tuple[int, int, int]] = []
+                    for (row_id, _), (has_exif, _) in zip(rows, results):
+                        score = 10 if has_exif else 0
+                        updates.append((row_id, has_exif, score))
+                    
+                    self._apply_metadata(conn, updates)
+                    conn.commit()
+
+    def _apply_metadata(self, conn: Any, updates: list[tuple[int, int, int]]) -> None:
+        """Write one page of metadata results.
+        
+        Stages the results in a keyed temp table and applies them in one
+        UPDATE instead of one statement per row. The table is emptied
+        rather than dropped, so later pages reuse it without a schema
+        change (which would force every cached statement to re-prepare).
+        
+        Args:
+            conn: Database connection object.
+            updates: List of tuples (id, has_exif, score).
+        """
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _metadata_updates (
+                id INTEGER PRIMARY KEY, has_exif INTEGER, score INTEGER
+            )
+        """)
+        conn.executemany("INSERT INTO _metadata_updates VALUES (?, ?, ?)", updates)
+        conn.execute("""
+            UPDATE media_files 
+            SET has_exif_date = (SELECT has_exif FROM _metadata_updates u WHERE u.id = media_files.id),
+                metadata_score = (SELECT score FROM _metadata_updates u WHERE u.id = media_files.id),
+                analyzed = 1 
+            WHERE id IN (SELECT id FROM _metadata_updates)
+        """)
+        conn.execute("DELETE FROM _metadata_updates")
 
     def process_duplicates(self) -> None:
         """Identify and judge duplicate files.
@@ -77,29 +321,42 @@ class Analyzer:
         Groups files by full hash and applies disposition rules to each group:
         one file is marked KEEP (winner) and others are marked DELETE (losers).
         Files with unique hashes are automatically marked KEEP.
+        
+        All groups are ranked in a single window-function UPDATE; on SQLite
+        builds older than 3.25 they are judged in Python instead, from one
+        read of every duplicate row.
         """
         self.logger.info("Judging files...")
         
         with self.db.get_connection() as conn:
-            sql_groups = """
-            SELECT hash_full, COUNT(*) as cnt 
-            FROM media_files 
-            WHERE hash_full IS NOT NULL 
-            GROUP BY hash_full 
-            HAVING cnt > 1
-            """
-            groups = conn.execute(sql_groups).fetchall()
-            self.logger.info(f"Found {len(groups)} sets of duplicates.")
-            
-            for hash_val, count in groups:
-                self._judge_group(conn, hash_val)
+            if _HAS_WINDOW_FUNCTIONS:
+                sql_groups = """
+                SELECT hash_full, COUNT(*) as cnt 
+                FROM media_files 
+                WHERE hash_full IS NOT NULL 
+                GROUP BY hash_full 
+                HAVING cnt > 1
+                """
+                # _JUDGE_SQL finds the groups itself; only their number is
+                # needed here, so they are counted in SQL, not fetched
+                n_groups = conn.execute(f"SELECT COUNT(*) FROM ({sql_groups})").fetchone()[0]
+                self.logger.info(f"Found {n_groups} sets of duplicates.")
+                if n_groups:
+                    conn.execute(_JUDGE_SQL)
+            else:
+                self._judge_groups(conn)
             
             sql_uniques = "UPDATE media_files SET disposition = 'KEEP' WHERE disposition IS NULL"
             conn.execute(sql_uniques)
             conn.commit()
 
-    def _judge_group(self, conn: Any, hash_val: str) -> None:
-        """Assign KEEP/DELETE dispositions to a group of duplicate files.
+    def _judge_groups(self, conn: Any) -> None:
+        """Assign KEEP/DELETE dispositions to every group of duplicate files.
+        
+        Fallback for SQLite without window functions; _JUDGE_SQL applies the
+        same ordering in one statement. All duplicate rows are read in one
+        query sorted by hash, so groups arrive contiguously and no per-group
+        SELECT is needed.
         
         The winner (KEEP) is selected using a multi-criteria sort that prioritizes:
         1. Files with EXIF metadata (higher metadata_score)
@@ -111,70 +368,34 @@ class Analyzer:
         
         Args:
             conn: Database connection object.
-            hash_val: Full hash value identifying the duplicate group.
         """
-        rows = conn.execute(
-            "SELECT id, file_path, metadata_score, created_at, modified_at FROM media_files WHERE hash_full = ?", 
-            (hash_val,)
-        ).fetchall()
-        
-        def sort_key(item: tuple[int, str, int, str, str]) -> tuple[int, str, int, int]:
-            """Generate sort key for duplicate selection.
-            
-            Returns a tuple that orders files by: metadata score (descending),
-            effective creation/modification date (ascending), filename cleanliness,
-            and path length (ascending).
-            """
-            score = item[2]
-            created = item[3]
-            modified = item[4]
-            path = item[1]
-            
-            effective_date = resolve_best_timestamp(created, modified)
-            
-            filename = os.path.basename(path)
-            name_penalty = -100 if "copy" in filename.lower() or "(" in filename else 0
-            
-            return (-score, effective_date, -name_penalty, len(path))
-
-        sorted_candidates = sorted(rows, key=sort_key)
-        
-        winner = sorted_candidates[0]
-        losers = sorted_candidates[1:]
-        
-        conn.execute("UPDATE media_files SET disposition = 'KEEP' WHERE id = ?", (winner[0],))
-        
-        if losers:
-            loser_ids = [str(x[0]) for x in losers]
-            conn.execute(
-                f"UPDATE media_files SET disposition = 'DELETE' WHERE id IN ({','.join(loser_ids)})"
+        rows = conn.execute("""
+            SELECT hash_full, id, file_path, metadata_score, created_at, modified_at
+            FROM media_files
+            WHERE hash_full IN (
+                SELECT hash_full FROM media_files
+                WHERE hash_full IS NOT NULL
+                GROUP BY hash_full HAVING COUNT(*) > 1
             )
-
-    def _extract_exif(self, path: str) -> tuple[int, str | None]:
-        """Extract EXIF date from an image file.
+            ORDER BY hash_full, id
+        """).fetchall()
         
-        Attempts to read EXIF data from the image, prioritizing the original
-        photo date (tag 36867) over general file date (tag 306).
+        updates: list[tuple[str, int]] = []
+        n_groups = 0
+        for _, group in groupby(rows, key=itemgetter(0)):
+            # Key per row: metadata score (descending), effective creation/
+            # modification date, filename cleanliness, path length. Only the
+            # winner is needed, so a single min() pass replaces the full sort.
+            keyed = [
+                ((-score, resolve_best_timestamp(created, modified),
+                  1 if _DIRTY_NAME(os.path.basename(path)) else 0, len(path)), row_id)
+                for _, row_id, path, score, created, modified in group
+            ]
+            _, winner_id = min(keyed, key=itemgetter(0))
+            updates.extend(
+                ('KEEP' if row_id == winner_id else 'DELETE', row_id) for _, row_id in keyed
+            )
+            n_groups += 1
         
-        Args:
-            path: File path to the image.
-            
-        Returns:
-            A tuple of (has_exif: int, date_str: str | None) where has_exif
-            is 1 if EXIF date was found, 0 otherwise.
-        """
-        try:
-            with Image.open(path) as img:
-                exif_data = img._getexif()
-                if not exif_data:
-                    return 0, None
-                
-                date_str = exif_data.get(36867)
-                if date_str:
-                    return 1, date_str
-                date_str = exif_data.get(306)
-                if date_str:
-                    return 1, date_str
-                return 0, None
-        except Exception:
-            return 0, None
\ No newline at end of file
+        self.logger.info(f"Found {n_groups} sets of duplicates.")
+        conn.executemany("UPDATE media_files SET disposition = ? WHERE id = ?", updates)
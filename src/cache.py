@@ -1,20 +1,57 @@
 """Persistent hash caching mechanism."""
 
+import atexit
+import itertools
 import sqlite3
 import os
 import logging
 from contextlib import contextmanager
 
+from src.db import migrate_hex_digests
+
+# page_size only takes effect on a new (empty) cache file, so it goes first.
+# Lookups hit the (file_size, hash_partial) primary key directly; mmap serves
+# those pages without read() calls.
+_CACHE_PRAGMAS = (
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Pending writes are flushed once this many accumulate
+FLUSH_THRESHOLD = 500
+
+# Rows per multi-row INSERT (3 bound values each, under SQLite's 999 limit)
+_MAX_INSERT_ROWS = 999 // 3
+
+# Keys per batched lookup (2 bound values each)
+_MAX_LOOKUP_PAIRS = 450
+
+# Partial-hash rows per multi-row INSERT (5 bound values each)
+_MAX_PARTIAL_INSERT_ROWS = 999 // 5
+
+# Partial-hash keys per batched lookup (3 bound values each, plus chunk_size)
+_MAX_PARTIAL_LOOKUPS = (999 - 1) // 3
+
 class HashCache:
     """
     Maintains a persistent cache of full file hashes.
     Key: (File Size, Partial Hash)
     Value: Full Hash
     
+    Partial hashes are cached too, so unchanged files skip the partial read
+    on later runs.
+    Key: (File Path, File Size, Modified Time, Chunk Size)
+    Value: Partial Hash
+    
     Located in the Target Root so it travels with the library.
+    
+    Writes are buffered and flushed in batches; pending entries are still
+    visible to get_full_hash before they reach disk.
     """
     
-    def __init__(self, target_root: str):
+    def __init__(self, target_root: str, hash_algo: str = "xxh3_64"):
         self.logger = logging.getLogger("MediaConsolidator.HashCache")
         
         # Ensure target root exists, otherwise put in CWD
@@ -25,33 +62,84 @@ class HashCache:
                 target_root = "."
                 
         self.db_path = os.path.join(target_root, ".media_hash_cache.db")
+        self.hash_algo = hash_algo
+        self._conn = None
+        self._pending = {}
+        self._pending_partials = {}
         self.initialize_schema()
+        atexit.register(self.close)
 
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """Yields the cache's persistent connection, opening it on first use."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in _CACHE_PRAGMAS:
+                self._conn.execute(pragma)
+        yield self._conn
+
+    def close(self):
+        """Flushes pending writes and closes the connection if it is open."""
+        self.flush(force=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def initialize_schema(self):
-        """Creates the cache table if it doesn't exist."""
+        """Creates the cache table if it doesn't exist.
+        
+        The hash algorithm is recorded alongside it; entries written with a
+        different algorithm are discarded rather than mixed with new ones.
+        Hex digests from older versions are converted to raw bytes.
+        """
         schema = """
         CREATE TABLE IF NOT EXISTS hash_cache (
             file_size INTEGER,
-            hash_partial TEXT,
-            hash_full TEXT,
+            hash_partial BLOB,
+            hash_full BLOB,
             last_seen INTEGER,
             PRIMARY KEY (file_size, hash_partial)
         );
+        CREATE TABLE IF NOT EXISTS partial_cache (
+            file_path TEXT,
+            file_size INTEGER,
+            modified_at REAL,
+            chunk_size INTEGER,
+            hash_partial BLOB,
+            last_seen INTEGER,
+            PRIMARY KEY (file_path, file_size, modified_at, chunk_size)
+        );
+        CREATE TABLE IF NOT EXISTS cache_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
         """
         with self.get_connection() as conn:
             conn.executescript(schema)
+            row = conn.execute("SELECT value FROM cache_meta WHERE key = 'hash_algo'").fetchone()
+            if row is None or row[0] != self.hash_algo:
+                # Caches from before the tag existed hold xxh64 digests
+                stale = row[0] if row else "xxh64"
+                deleted = conn.execute("DELETE FROM hash_cache").rowcount
+                conn.execute("DELETE FROM partial_cache")
+                if deleted > 0:
+                    self.logger.info(f"Discarded {deleted} cached {stale} hashes (now using {self.hash_algo}).")
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('hash_algo', ?)",
+                    (self.hash_algo,),
+                )
+            # user_version 1: digests are stored as BLOBs
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                migrate_hex_digests(conn, "hash_cache", ("hash_partial", "hash_full"))
+                migrate_hex_digests(conn, "partial_cache", ("hash_partial",))
+                conn.execute("PRAGMA user_version = 1")
             conn.commit()
 
-    def get_full_hash(self, file_size: int, partial_hash: str) -> str:
+    def get_full_hash(self, file_size: int, partial_hash: bytes) -> bytes:
         """Retrieves full hash if we've processed this exact file signature before."""
+        pending = self._pending.get((file_size, partial_hash))
+        if pending:
+            return pending
         query = "SELECT hash_full FROM hash_cache WHERE file_size = ? AND hash_partial = ?"
         with self.get_connection() as conn:
             row = conn.execute(query, (file_size, partial_hash)).fetchone()
@@ -59,16 +147,116 @@ class HashCache:
                 return row[0]
         return None
 
-    def put_full_hash(self, file_size: int, partial_hash: str, full_hash: str):
-        """Saves a computed hash for future runs."""
+    def get_many(self, pairs):
+        """Retrieves cached full hashes for many (file_size, partial_hash) keys at once.
+        
+        Returns a dict of only the keys that were found.
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(pairs):
+            if key in self._pending:
+                found[key] = self._pending[key]
+            else:
+                missing.append(key)
+        
+        with self.get_connection() as conn:
+            for start in range(0, len(missing), _MAX_LOOKUP_PAIRS):
+                chunk = missing[start:start + _MAX_LOOKUP_PAIRS]
+                query = f"""
+                WITH keys(sz, ph) AS (VALUES {",".join(["(?, ?)"] * len(chunk))})
+                SELECT sz, ph, hash_full FROM hash_cache
+                JOIN keys ON hash_cache.file_size = keys.sz AND hash_cache.hash_partial = keys.ph
+                """
+                for size, p_hash, full_hash in conn.execute(query, list(itertools.chain.from_iterable(chunk))):
+                    if full_hash:
+                        found[(size, p_hash)] = full_hash
+        return found
+
+    def put_full_hash(self, file_size: int, partial_hash: bytes, full_hash: bytes):
+        """Queues a computed hash for future runs."""
+        self._pending[(file_size, partial_hash)] = full_hash
+        self.flush()
+
+    def put_many(self, rows):
+        """Queues many (file_size, partial_hash, full_hash) rows."""
+        for file_size, partial_hash, full_hash in rows:
+            self._pending[(file_size, partial_hash)] = full_hash
+        self.flush()
+
+    def get_partials(self, files, chunk_size: int):
+        """Retrieves cached partial hashes for many (file_path, file_size, modified_at) keys.
+        
+        Returns a dict of only the keys that were found. Files without a
+        modified time are never cached.
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(files):
+            if key[2] is None:
+                continue
+            pending = self._pending_partials.get((*key, chunk_size))
+            if pending:
+                found[key] = pending
+            else:
+                missing.append(key)
+        
+        with self.get_connection() as conn:
+            for start in range(0, len(missing), _MAX_PARTIAL_LOOKUPS):
+                chunk = missing[start:start + _MAX_PARTIAL_LOOKUPS]
+                query = f"""
+                WITH keys(fp, sz, mt) AS (VALUES {",".join(["(?, ?, ?)"] * len(chunk))})
+                SELECT fp, sz, mt, hash_partial FROM partial_cache
+                JOIN keys ON partial_cache.file_path = keys.fp
+                AND partial_cache.file_size = keys.sz
+                AND partial_cache.modified_at = keys.mt
+                WHERE partial_cache.chunk_size = ?
+                """
+                params = list(itertools.chain.from_iterable(chunk))
+                params.append(chunk_size)
+                for path, size, mtime, p_hash in conn.execute(query, params):
+                    if p_hash:
+                        found[(path, size, mtime)] = p_hash
+        return found
+
+    def put_partial_many(self, rows, chunk_size: int):
+        """Queues many (file_path, file_size, modified_at, partial_hash) rows."""
+        for path, size, mtime, p_hash in rows:
+            if mtime is not None:
+                self._pending_partials[(path, size, mtime, chunk_size)] = p_hash
+        self.flush()
+
+    def flush(self, force: bool = False):
+        """Writes pending hashes in one transaction once enough have queued."""
+        queued = len(self._pending) + len(self._pending_partials)
+        if not queued or (queued < FLUSH_THRESHOLD and not force):
+            return
+        
+        rows = [(size, p_hash, f_hash) for (size, p_hash), f_hash in self._pending.items()]
+        partial_rows = [(*key, p_hash) for key, p_hash in self._pending_partials.items()]
+        self._pending = {}
+        self._pending_partials = {}
+        
         # INSERT OR REPLACE updates the entry if it exists
         query = """
         INSERT OR REPLACE INTO hash_cache (file_size, hash_partial, hash_full, last_seen)
-        VALUES (?, ?, ?, strftime('%s', 'now'))
-        """
+        VALUES """
+        row_sql = "(?, ?, ?, strftime('%s', 'now'))"
+        partial_query = """
+        INSERT OR REPLACE INTO partial_cache
+        (file_path, file_size, modified_at, chunk_size, hash_partial, last_seen)
+        VALUES """
+        partial_row_sql = "(?, ?, ?, ?, ?, strftime('%s', 'now'))"
         try:
             with self.get_connection() as conn:
-                conn.execute(query, (file_size, partial_hash, full_hash))
+                for start in range(0, len(rows), _MAX_INSERT_ROWS):
+                    chunk = rows[start:start + _MAX_INSERT_ROWS]
+                    conn.execute(query + ",".join([row_sql] * len(chunk)),
+                                 list(itertools.chain.from_iterable(chunk)))
+                for start in range(0, len(partial_rows), _MAX_PARTIAL_INSERT_ROWS):
+                    chunk = partial_rows[start:start + _MAX_PARTIAL_INSERT_ROWS]
+                    conn.execute(partial_query + ",".join([partial_row_sql] * len(chunk)),
+                                 list(itertools.chain.from_iterable(chunk)))
                 conn.commit()
         except sqlite3.Error as e:
-            self.logger.warning(f"Failed to cache hash: {e}")
\ No newline at end of file
+            self.logger.warning(f"Failed to cache hash: {e}")
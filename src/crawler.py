@@ -1,10 +1,11 @@
 """Recursive directory crawler for discovering media files."""
 
+import itertools
 import logging
 import os
+import sqlite3
 import stat
 from collections.abc import Generator
-from pathlib import Path
 from typing import Any
 
 from src.db import DatabaseManager
@@ -21,6 +22,16 @@ _BUILTIN_EXCLUDE_PREFIXES = {
     "node_modules",
 }
 
+# Resolved once: macOS, BSD and Windows (3.12+) expose a real creation time
+_HAS_BIRTHTIME = hasattr(os.stat_result, 'st_birthtime')
+
+_INSERT_SQL = """INSERT OR IGNORE INTO media_files 
+                 (file_path, file_size, file_ext, created_at, modified_at) 
+                 VALUES """
+
+# Rows per multi-row INSERT, kept under SQLite's historic 999 bound-variable limit
+_MAX_INSERT_ROWS = 999 // 5
+
 
 class FileCrawler:
     """Recursively scan directories and index media files into the database.
@@ -55,10 +66,14 @@ class FileCrawler:
             for ext in cat:
                 self.allowed_exts.add(ext.lower())
         
+        # Lower and upper forms so the common all-one-case names skip lower()
+        self._ext_suffixes = tuple(sorted(self.allowed_exts | {e.upper() for e in self.allowed_exts}))
+        
         self.batch_size = 1000
         org_config = config.get("organization", {})
-        self.trash_path = org_config.get("trash_folder", "").replace('\\', '/')
-        self.excluded_names = {x.lower() for x in org_config.get("exclude_dirs", [])}
+        trash = org_config.get("trash_folder", "")
+        self.trash_path = os.path.abspath(trash).replace('\\', '/') if trash else ""
+        self.excluded_names = frozenset(x.lower() for x in org_config.get("exclude_dirs", []))
 
     def scan_roots(self, root_paths: list[str]) -> int:
         """Scan one or more root directories for media files.
@@ -70,18 +85,29 @@ class FileCrawler:
             Total number of files indexed across all roots.
         """
         total_added = 0
-        for root in root_paths:
-            if not os.path.exists(root):
-                self.logger.warning(f"Path not found: {root}")
-                continue
+        with self.db.get_connection() as conn:
+            # One write transaction for the whole crawl; indexes are rebuilt
+            # once at the end rather than maintained on every insert.
+            conn.execute("BEGIN IMMEDIATE")
+            self.db.drop_indexes(conn)
+            
+            for root in root_paths:
+                if not os.path.exists(root):
+                    self.logger.warning(f"Path not found: {root}")
+                    continue
+                
+                # Stored paths are absolute so later phases can compare them
+                # as plain strings instead of resolving each one again
+                norm_root = os.path.abspath(root).replace('\\', '/')
+                self.logger.info(f"Scanning: {norm_root}")
+                total_added += self._process_directory(conn, norm_root)
             
-            norm_root = root.replace('\\', '/')
-            self.logger.info(f"Scanning: {norm_root}")
-            total_added += self._process_directory(norm_root)
+            self.db.create_indexes(conn)
+            conn.commit()
         
         return total_added
 
-    def _process_directory(self, root_path: str) -> int:
+    def _process_directory(self, conn: sqlite3.Connection, root_path: str) -> int:
         """Recursively process a directory and buffer files for insertion.
         
         Collects file entries into batches and inserts them into the database
@@ -89,6 +115,7 @@ class FileCrawler:
         directories based on configured filters.
         
         Args:
+            conn: Connection holding the crawl transaction.
             root_path: Directory path to process.
             
         Returns:
@@ -97,26 +124,32 @@ class FileCrawler:
         buffer: list[tuple[str, int, str, float, float]] = []
         count = 0
         
+        # Trash subfolders are pruned during the walk, so only a root that
+        # is itself inside the trash needs checking here.
+        if self.trash_path and root_path.startswith(self.trash_path):
+            return 0
+        
+        # Paths are stored with forward slashes; only Windows yields backslashes
+        native_sep = os.sep != '/'
+        
         for entry in self._fast_scandir(root_path):
-            full_path = entry.path.replace('\\', '/')
-            
-            if self.trash_path and full_path.startswith(self.trash_path):
-                continue
+            full_path = entry.path.replace('\\', '/') if native_sep else entry.path
             
-            if self._is_media(entry.name):
-                stat = entry.stat()
-                c_time = getattr(stat, 'st_birthtime', stat.st_ctime)
+            ext = self._media_ext(entry.name)
+            if ext:
+                stat = entry.stat(follow_symlinks=False)
+                c_time = stat.st_birthtime if _HAS_BIRTHTIME else stat.st_ctime
                 m_time = stat.st_mtime
-                file_data = (full_path, stat.st_size, Path(full_path).suffix.lower(), c_time, m_time)
+                file_data = (full_path, stat.st_size, ext, c_time, m_time)
                 buffer.append(file_data)
 
                 if len(buffer) >= self.batch_size:
-                    self._flush_buffer(buffer)
+                    self._flush_buffer(conn, buffer)
                     count += len(buffer)
                     buffer = []
 
         if buffer:
-            self._flush_buffer(buffer)
+            self._flush_buffer(conn, buffer)
             count += len(buffer)
             
         return count
@@ -136,28 +169,36 @@ class FileCrawler:
             path: Directory path to scan.
             
         Yields:
-            File entry objects (directories are recursed into).
+            File entry objects (directories are pushed onto the stack).
         """
-        try:
-            with os.scandir(path) as it:
+        # Explicit stack instead of recursive generators: no frame per
+        # directory and no recursion limit on deep trees.
+        stack = [path]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
                 for entry in it:
-                    if entry.is_dir(follow_symlinks=False):
-                        if entry.is_symlink():
-                            continue
-                        
-                        name_lower = entry.name.lower()
-                        
-                        if name_lower.startswith('$') or name_lower.startswith('.'):
-                            continue
-                        
-                        if self._should_exclude_dir(name_lower, entry.path):
-                            continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.is_symlink():
+                                continue
                             
-                        yield from self._fast_scandir(entry.path)
-                    elif entry.is_file(follow_symlinks=False):
-                        yield entry
-        except (PermissionError, OSError):
-            pass
+                            name_lower = entry.name.lower()
+                            
+                            if name_lower[:1] in ('$', '.'):
+                                continue
+                            
+                            if self._should_exclude_dir(name_lower, entry.path):
+                                continue
+                            
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError:
+                        continue
 
     def _should_exclude_dir(self, name_lower: str, dir_path: str) -> bool:
         """Determine if a directory should be excluded from scanning.
@@ -194,30 +235,51 @@ class FileCrawler:
         
         return False
 
-    def _is_media(self, filename: str) -> bool:
-        """Check if a file has an allowed media extension.
+    def _media_ext(self, filename: str) -> str:
+        """Return a file's lowercased extension if it is an allowed media type.
         
         Args:
             filename: Name of the file to check.
             
         Returns:
-            True if the file extension matches an allowed media type.
+            The extension (e.g. ".jpg"), or an empty string if the file is
+            not an allowed media type.
         """
-        _, ext = os.path.splitext(filename)
-        return ext.lower() in self.allowed_exts
+        # Cheap C-level suffix test first; lower() only for mixed-case names
+        if not filename.endswith(self._ext_suffixes):
+            if not filename.lower().endswith(self._ext_suffixes):
+                return ""
+        
+        # Same rules as os.path.splitext: leading dots are not an extension
+        dot = filename.rfind('.')
+        if not filename[:dot].lstrip('.'):
+            return ""
+        ext = filename[dot:].lower()
+        return ext if ext in self.allowed_exts else ""
 
-    def _flush_buffer(self, data: list[tuple[str, int, str, float, float]]) -> None:
+    def _flush_buffer(
+        self,
+        conn: sqlite3.Connection,
+        data: list[tuple[str, int, str, float, float]],
+    ) -> None:
         """Insert buffered file records into the database.
         
         Uses INSERT OR IGNORE to prevent duplicate entries if the same file
-        is encountered multiple times during scanning.
+        is encountered multiple times during scanning. The caller owns the
+        transaction, so nothing is committed here.
         
         Args:
+            conn: Connection holding the crawl transaction.
             data: List of tuples (file_path, file_size, file_ext, created_at, modified_at).
         """
-        sql = """INSERT OR IGNORE INTO media_files 
-                 (file_path, file_size, file_ext, created_at, modified_at) 
-                 VALUES (?, ?, ?, ?, ?)"""
-        with self.db.get_connection() as conn:
-            conn.executemany(sql, data)
-            conn.commit()
\ No newline at end of file
+        # Full chunks go through one multi-row statement each; the leftover
+        # rows use the single-row form.
+        full = len(data) - len(data) % _MAX_INSERT_ROWS
+        if full:
+            multi_sql = _INSERT_SQL + ",".join(["(?, ?, ?, ?, ?)"] * _MAX_INSERT_ROWS)
+            for start in range(0, full, _MAX_INSERT_ROWS):
+                chunk = data[start:start + _MAX_INSERT_ROWS]
+                conn.execute(multi_sql, list(itertools.chain.from_iterable(chunk)))
+        
+        if full < len(data):
+            conn.executemany(_INSERT_SQL + "(?, ?, ?, ?, ?)", data[full:])
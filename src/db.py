@@ -4,6 +4,79 @@ import sqlite3
 from collections.abc import Iterator
 from contextlib import contextmanager
 
+# Bulk-load tuning applied to every new connection. WAL + NORMAL syncs far
+# less often than the default rollback journal; the index is rebuilt from
+# disk on every run, so losing the last commits on power loss is harmless.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# Secondary indexes by name. Kept separate from the table DDL so bulk loads
+# can drop them and rebuild once afterwards instead of per inserted row.
+_INDEXES = {
+    "idx_file_size": "CREATE INDEX IF NOT EXISTS idx_file_size ON media_files(file_size)",
+    "idx_hash_full": "CREATE INDEX IF NOT EXISTS idx_hash_full ON media_files(hash_full)",
+    # Backs the hasher's size and (size, partial) group counts
+    "idx_size_partial": (
+        "CREATE INDEX IF NOT EXISTS idx_size_partial ON media_files(file_size, hash_partial)"
+    ),
+    # Covers every column duplicate judging reads, so ranking a group never
+    # touches the table rows
+    "idx_hash_judge": (
+        "CREATE INDEX IF NOT EXISTS idx_hash_judge ON media_files"
+        "(hash_full, metadata_score, created_at, modified_at, file_path)"
+    ),
+    # Only rows still waiting for metadata analysis
+    "idx_analyzed": (
+        "CREATE INDEX IF NOT EXISTS idx_analyzed ON media_files(analyzed) WHERE analyzed = 0"
+    ),
+}
+
+
+def unhex_digest(value: object) -> object:
+    """Decode a hex digest string to raw bytes, leaving anything else as is.
+    
+    Used as an SQL function to migrate hashes written before they were
+    stored as BLOBs.
+    
+    Args:
+        value: Column value to convert.
+        
+    Returns:
+        The decoded bytes, or value unchanged if it is not valid hex text.
+    """
+    if isinstance(value, str):
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return value
+
+
+def migrate_hex_digests(conn: sqlite3.Connection, table: str, columns: tuple[str, ...]) -> int:
+    """Rewrite hex-text digests in the given columns as raw BLOBs in place.
+    
+    Args:
+        conn: Connection to execute on; the caller commits.
+        table: Table holding the digest columns.
+        columns: Digest column names.
+        
+    Returns:
+        Number of rows converted.
+    """
+    conn.create_function("unhex_digest", 1, unhex_digest, deterministic=True)
+    converted = 0
+    for col in columns:
+        converted += conn.execute(
+            f"UPDATE {table} SET {col} = unhex_digest({col}) WHERE typeof({col}) = 'text'"
+        ).rowcount
+    return converted
+
 
 class DatabaseManager:
     """Manage SQLite database connections and schema for media file metadata.
@@ -20,20 +93,48 @@ class DatabaseManager:
             db_path: Path to the SQLite database file.
         """
         self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
 
     @contextmanager
     def get_connection(self) -> Iterator[sqlite3.Connection]:
-        """Get a database connection with automatic cleanup.
+        """Get the shared database connection.
+        
+        The connection is opened lazily on first use and reused by every
+        pipeline phase, so the SQLite page cache stays warm between phases.
+        Work left uncommitted when the block raises is rolled back. It is
+        opened with check_same_thread=False, but phases must still use it
+        from one thread at a time.
         
         Yields:
-            A SQLite connection object that is automatically closed when
-            the context manager exits.
+            The shared SQLite connection object.
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         try:
             yield conn
-        finally:
-            conn.close()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def connect(self) -> sqlite3.Connection:
+        """Return the persistent connection, opening it on first use.
+        
+        Statements executed on it stay in sqlite3's prepared-statement
+        cache for the life of the connection.
+        
+        Returns:
+            The shared SQLite connection object.
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in _CONNECTION_PRAGMAS:
+                self._conn.execute(pragma)
+        return self._conn
+
+    def close(self) -> None:
+        """Close the shared connection if it is open."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def initialize_schema(self) -> None:
         """Create the media_files table and indexes if they don't exist.
@@ -41,7 +142,9 @@ class DatabaseManager:
         Creates a single media_files table with columns for file metadata,
         content hashes, EXIF data, processing state, and disposition.
         Both created_at and modified_at timestamps are stored to determine
-        the true oldest timestamp of a file across system updates.
+        the true oldest timestamp of a file across system updates. Content
+        hashes are raw 8-byte digests; hex strings left by older versions
+        are converted in place.
         """
         schema = """
         CREATE TABLE IF NOT EXISTS media_files (
@@ -51,8 +154,8 @@ class DatabaseManager:
             file_ext TEXT,
             created_at REAL,
             modified_at REAL,
-            hash_partial TEXT,
-            hash_full TEXT,
+            hash_partial BLOB,
+            hash_full BLOB,
             phash TEXT,
             has_exif_date INTEGER DEFAULT 0,
             has_gps INTEGER DEFAULT 0,
@@ -63,15 +166,37 @@ class DatabaseManager:
             disposition TEXT,
             target_path TEXT
         );
-        
-        CREATE INDEX IF NOT EXISTS idx_file_size ON media_files(file_size);
-        CREATE INDEX IF NOT EXISTS idx_hash_full ON media_files(hash_full);
         """
         
         with self.get_connection() as conn:
             conn.executescript(schema)
+            # user_version 1: digests are stored as BLOBs
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                migrate_hex_digests(conn, "media_files", ("hash_partial", "hash_full"))
+                conn.execute("PRAGMA user_version = 1")
+            self.create_indexes(conn)
             conn.commit()
 
+    def drop_indexes(self, conn: sqlite3.Connection) -> None:
+        """Drop the secondary indexes ahead of a bulk insert.
+        
+        Runs on the caller's connection so it joins any open transaction.
+        
+        Args:
+            conn: Connection to execute on.
+        """
+        for name in _INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def create_indexes(self, conn: sqlite3.Connection) -> None:
+        """Create any missing secondary indexes.
+        
+        Args:
+            conn: Connection to execute on.
+        """
+        for ddl in _INDEXES.values():
+            conn.execute(ddl)
+
     def wipe_db(self) -> None:
         """Drop the media_files table and all its data.
         
@@ -1,15 +1,161 @@
 """File movement execution with dry-run support and audit trails."""
 
+import errno
 import logging
 import os
 import shutil
+import stat
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any
 
 from src.db import DatabaseManager
-from src.utils import set_file_creation_time, apply_jitter_if_midnight, resolve_best_timestamp
+from src.utils import set_file_creation_time, set_file_times, apply_jitter_if_midnight, resolve_best_timestamp
+
+# NTFS paths that differ only by case refer to the same file
+_CASE_INSENSITIVE_FS = os.name == 'nt'
+
+# os.link failures meaning "this filesystem has no hard links", not a real error
+_NO_HARDLINK_ERRNOS = {
+    errno.EPERM, errno.EMLINK, errno.ENOSYS, errno.EOPNOTSUPP,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+# Only the Win32 API lets us set a file's creation time
+_HAS_SETTABLE_CTIME = os.name == 'nt'
+
+
+def _zero_copy_move(src: str, dst: str) -> None:
+    """Move a file without ever replacing an existing destination.
+    
+    On Windows os.rename already refuses an existing destination. On POSIX,
+    where rename silently replaces it, the file is hard-linked to dst
+    (which fails if dst exists) and then unlinked from src; filesystems
+    without hard links fall back to a checked rename. Across drives the
+    destination is created exclusively before shutil.copyfile fills it.
+    That copy stays in the kernel on Linux (sendfile/copy_file_range) and
+    macOS (fcopyfile); on Windows it is a userspace buffered copy.
+    Permission bits and timestamps are carried over with one os.chmod and
+    one os.utime rather than shutil.move's full copystat.
+    
+    Args:
+        src: Source file path.
+        dst: Destination file path; must not exist yet.
+        
+    Raises:
+        FileExistsError: If something already exists at dst.
+    """
+    try:
+        if os.name == 'nt':
+            os.rename(src, dst)
+        else:
+            _link_move(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    
+    st = os.stat(src)
+    # Claim dst first: O_EXCL fails instead of truncating someone else's
+    # file. Private until the copy is done; the source's mode is applied after
+    os.close(os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600))
+    try:
+        shutil.copyfile(src, dst)
+        os.chmod(dst, stat.S_IMODE(st.st_mode))
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except BaseException:
+        # Never leave a partial copy behind; the source is still intact
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        raise
+    os.unlink(src)
+
+
+def _link_move(src: str, dst: str) -> None:
+    """Same-filesystem POSIX move that refuses to replace dst.
+    
+    Args:
+        src: Source file path.
+        dst: Destination file path.
+    """
+    try:
+        os.link(src, dst, follow_symlinks=False)
+    except FileExistsError:
+        # A case-only rename on a case-insensitive volume (macOS) finds
+        # the file itself at dst; renaming it in place is safe
+        if src.lower() == dst.lower() and os.path.samefile(src, dst):
+            os.rename(src, dst)
+            return
+        raise
+    except OSError as e:
+        if e.errno not in _NO_HARDLINK_ERRNOS:
+            raise
+        # No hard links here (FAT/exFAT, some network shares): check, then
+        # rename. Only another process could slip in between the two.
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, "Destination exists", dst)
+        os.rename(src, dst)
+        return
+    try:
+        os.unlink(src)
+    except BaseException:
+        # Keep a single copy: drop the new link, leaving the source in place
+        os.unlink(dst)
+        raise
+
+
+def _path_key(path: str) -> str:
+    """Comparison key for a path; case-blind on Windows."""
+    return os.path.normcase(path) if _CASE_INSENSITIVE_FS else path
+
+
+def _split_keeper_moves(
+    rows: list[tuple], delete_sources: set[str]
+) -> tuple[list[tuple], list[tuple]]:
+    """Separate KEEP moves that can run concurrently from ones that must wait.
+    
+    The librarian only avoids other planned targets, so a target can still
+    be where another file sits right now: a keeper that is itself being
+    moved on, or a duplicate headed for the trash. Such a move has to wait
+    until that file has left, or it would be refused as a collision.
+    Waiting moves are ordered so each comes after the move that vacates
+    its target (cycles, which no order can satisfy, are cut arbitrarily
+    and the move that finds its target still taken is refused).
+    
+    Args:
+        rows: KEEP rows (id, file_path, target_path, created_at, modified_at).
+        delete_sources: Path keys of files the delete phase will move away.
+        
+    Returns:
+        Tuple (independent, waiting): rows safe to move in parallel right
+        away, and rows to move one at a time after the delete phase.
+    """
+    by_source = {_path_key(row[1]): row for row in rows}
+    waiting_ids = set()
+    for row in rows:
+        dst_key = _path_key(row[2])
+        blocker = by_source.get(dst_key)
+        if (blocker is not None and blocker is not row) or dst_key in delete_sources:
+            waiting_ids.add(row[0])
+    
+    independent = [row for row in rows if row[0] not in waiting_ids]
+    waiting: list[tuple] = []
+    ordered: set[int] = set()
+    for row in rows:
+        # Walk to the first move of the chain, then emit it back to front
+        chain = []
+        current = row
+        while current is not None and current[0] in waiting_ids and current[0] not in ordered:
+            ordered.add(current[0])
+            chain.append(current)
+            current = by_source.get(_path_key(current[2]))
+        waiting.extend(reversed(chain))
+    return independent, waiting
 
 
 class Executioner:
@@ -30,7 +176,10 @@ class Executioner:
         
         Args:
             db: Database manager instance.
-            config: Configuration dictionary containing organization.trash_folder.
+            config: Configuration dictionary containing organization.trash_folder,
+                organization.target_root, optionally organization.receipts_mode
+                ("per_folder" or "central") and execution.move_concurrency
+                (parallel moves).
             dry_run: If True, log operations without moving files. Defaults to True.
         """
         self.db = db
@@ -39,8 +188,13 @@ class Executioner:
         
         org_cfg = config.get("organization", {})
         self.trash_root = org_cfg.get("trash_folder", "C:/MediaConsolidator_Trash")
+        self.target_root = org_cfg.get("target_root", ".")
+        self.receipts_mode = org_cfg.get("receipts_mode", "per_folder")
+        self.move_concurrency = config.get("execution", {}).get("move_concurrency", 8)
         
         self.receipt_buffer: dict[str, list[str]] = defaultdict(list)
+        self._created_dirs: set[str] = set()
+        self._dirs_lock = threading.Lock()
 
     def execute(self) -> None:
         """Execute the complete file organization plan.
@@ -51,18 +205,25 @@ class Executioner:
         mode = "DRY RUN" if self.dry_run else "LIVE"
         self.logger.info(f"Starting Execution Phase. Mode: {mode}")
         
-        self._process_keepers()
+        waiting = self._process_keepers()
         self._process_deletes()
+        self._process_waiting_keepers(waiting)
         self._write_trace_receipts()
         
         self.logger.info("Execution Phase Complete.")
 
-    def _process_keepers(self) -> None:
+    def _process_keepers(self) -> list[tuple]:
         """Move files marked KEEP to their organized target locations.
         
         Also updates the metadata of the moved file:
         1. Sets Creation Time to the oldest known date (jittered if midnight).
         2. Restores original Modified Time.
+        
+        Moves whose target is still occupied by a file that is about to be
+        moved (see _split_keeper_moves) are not attempted here.
+        
+        Returns:
+            Those waiting rows, for _process_waiting_keepers.
         """
         # UPDATED SQL: Fetch timestamps
         sql = """SELECT id, file_path, target_path, created_at, modified_at 
@@ -73,32 +234,92 @@ class Executioner:
             rows = conn.execute(sql).fetchall()
             self.logger.info(f"Processing {len(rows)} Keepers...")
             
-            for row_id, src, dst, c_time, m_time in rows:
-                if self.dry_run:
+            if self.dry_run:
+                for row_id, src, dst, c_time, m_time in rows:
                     self.logger.info(f"[DRY] Move: '{src}' -> '{dst}'")
-                    continue
-                
-                if self._safe_move(src, dst):
-                    # --- METADATA UPDATE START ---
-                    try:
-                        # 1. Determine oldest known date
-                        best_ts = resolve_best_timestamp(c_time, m_time)
-                        
-                        # 2. Apply Jitter if exact midnight
-                        final_creation_ts = apply_jitter_if_midnight(best_ts)
-                        
-                        # 3. Set Creation Time (Win32)
-                        set_file_creation_time(dst, final_creation_ts)
-                        
-                        # 4. Restore Modified Time (Legacy preservation)
-                        # os.utime sets (atime, mtime). We use current for access.
-                        os.utime(dst, (time.time(), m_time))
-                        
-                    except Exception as e:
-                        self.logger.warning(f"Metadata fix failed for {dst}: {e}")
-                    # --- METADATA UPDATE END ---
-
-                    self._log_receipt(src, f"[MOVED] '{os.path.basename(src)}' -> '{dst}'")
+                return []
+            
+            delete_sources = {
+                _path_key(path) for (path,) in
+                conn.execute("SELECT file_path FROM media_files WHERE disposition = 'DELETE'")
+            }
+        
+        independent, waiting = _split_keeper_moves(rows, delete_sources)
+        if waiting:
+            self.logger.info(f"{len(waiting)} Keepers wait for their target to be vacated.")
+        
+        # Moves run concurrently; map() keeps results in row order so
+        # receipts are recorded on this thread in a stable order
+        with ThreadPoolExecutor(max_workers=self.move_concurrency) as executor:
+            for row, moved in zip(independent, executor.map(self._move_keeper, independent)):
+                if moved:
+                    self._log_keeper_receipt(row)
+        return waiting
+
+    def _process_waiting_keepers(self, rows: list[tuple]) -> None:
+        """Move the keepers held back by _process_keepers, one at a time.
+        
+        Runs after the delete phase, so every file that was in the way has
+        been moved; rows arrive ordered so each target is vacated first.
+        
+        Args:
+            rows: Waiting KEEP rows, in move order.
+        """
+        for row in rows:
+            if self._move_keeper(row):
+                self._log_keeper_receipt(row)
+
+    def _log_keeper_receipt(self, row: tuple[int, str, str, float, float]) -> None:
+        """Record the receipt for one moved KEEP file.
+        
+        Args:
+            row: Tuple (id, file_path, target_path, created_at, modified_at).
+        """
+        _, src, dst, _, _ = row
+        self._log_receipt(src, f"[MOVED] '{os.path.basename(src)}' -> '{dst}'")
+
+    def _move_keeper(self, row: tuple[int, str, str, float, float]) -> bool:
+        """Move one KEEP file into place and fix its timestamps.
+        
+        Runs on a move worker thread.
+        
+        Args:
+            row: Tuple (id, file_path, target_path, created_at, modified_at).
+            
+        Returns:
+            True if the file was physically moved.
+        """
+        row_id, src, dst, c_time, m_time = row
+        if not self._safe_move(src, dst):
+            return False
+        
+        # --- METADATA UPDATE START ---
+        try:
+            if not _HAS_SETTABLE_CTIME:
+                # Creation time cannot be set here; one utime restores the
+                # modified time (access time is set to now)
+                os.utime(dst, ns=(time.time_ns(), int(m_time * 1_000_000_000)))
+                return True
+            
+            # 1. Determine oldest known date
+            best_ts = resolve_best_timestamp(c_time, m_time)
+            
+            # 2. Apply Jitter if exact midnight
+            final_creation_ts = apply_jitter_if_midnight(best_ts)
+            
+            # 3. Set Creation + Modified Time in one handle (Win32).
+            # Access time is set to now.
+            now = time.time()
+            if not set_file_times(dst, final_creation_ts, m_time, now):
+                # 4. Fallback: creation time separately, then os.utime (atime, mtime)
+                set_file_creation_time(dst, final_creation_ts)
+                os.utime(dst, (now, m_time))
+            
+        except Exception as e:
+            self.logger.warning(f"Metadata fix failed for {dst}: {e}")
+        # --- METADATA UPDATE END ---
+        
+        return True
 
     def _process_deletes(self) -> None:
         """Move duplicate files to trash.
@@ -116,20 +337,27 @@ class Executioner:
         with self.db.get_connection() as conn:
             rows = conn.execute(sql).fetchall()
             self.logger.info(f"Processing {len(rows)} files to Trash...")
-            for row_id, src, winner_dst in rows:
-                filename = os.path.basename(src)
-                trash_path = os.path.join(self.trash_root, f"{row_id}_{filename}")
-                if self.dry_run:
+            sources = [src for _, src, _ in rows]
+            trash_paths = [
+                os.path.join(self.trash_root, f"{row_id}_{os.path.basename(src)}")
+                for row_id, src, _ in rows
+            ]
+            if self.dry_run:
+                for src, trash_path in zip(sources, trash_paths):
                     self.logger.info(f"[DRY] Trash: '{src}' -> '{trash_path}'")
-                    continue
-                
-                if self._safe_move(src, trash_path):
-                    msg = (
-                        f"[DUPLICATE CONSOLIDATED] '{filename}' -> '{winner_dst}'"
-                        if winner_dst
-                        else f"[MOVED TO TRASH] '{filename}'"
-                    )
-                    self._log_receipt(src, msg)
+                return
+            
+            with ThreadPoolExecutor(max_workers=self.move_concurrency) as executor:
+                results = executor.map(self._safe_move, sources, trash_paths)
+                for (row_id, src, winner_dst), moved in zip(rows, results):
+                    if moved:
+                        filename = os.path.basename(src)
+                        msg = (
+                            f"[DUPLICATE CONSOLIDATED] '{filename}' -> '{winner_dst}'"
+                            if winner_dst
+                            else f"[MOVED TO TRASH] '{filename}'"
+                        )
+                        self._log_receipt(src, msg)
 
     def _safe_move(self, src: str, dst: str) -> bool:
         """Safely move a file with validation and error handling.
@@ -146,26 +374,55 @@ class Executioner:
         Returns:
             True if file was physically moved, False if skipped or failed.
         """
-        try:
-            abs_src = os.path.abspath(src)
-            abs_dst = os.path.abspath(dst)
-
-            if abs_src == abs_dst:
-                self.logger.debug(f"Skipping move (Already in place): {src}")
-                return False
-
-            if not os.path.exists(src):
-                self.logger.warning(f"Source file missing: {src}")
-                return False
+        # The crawler and librarian store absolute, forward-slash paths, so
+        # no per-file abspath is needed; only Windows compares case-blind
+        if _CASE_INSENSITIVE_FS:
+            same = os.path.normcase(src) == os.path.normcase(dst)
+        else:
+            same = src == dst
+        if same:
+            self.logger.debug(f"Skipping move (Already in place): {src}")
+            return False
 
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            shutil.move(src, dst)
+        try:
+            self._ensure_dir(os.path.dirname(dst))
+            # A vanished source surfaces from the move itself, saving a stat
+            _zero_copy_move(src, dst)
             return True
             
+        except FileNotFoundError:
+            self.logger.warning(f"Source file missing: {src}")
+            return False
+        except FileExistsError:
+            self.logger.error(f"Move failed: {src} -> {dst} | Target already exists")
+            return False
         except Exception as e:
             self.logger.error(f"Move failed: {src} -> {dst} | Error: {e}")
             return False
 
+    def _ensure_dir(self, parent: str) -> None:
+        """Create a destination directory once per run.
+        
+        Many files share a handful of target folders, so directories already
+        created (and their ancestors) are remembered and skipped. Safe to call
+        from move worker threads.
+        
+        Args:
+            parent: Directory that must exist.
+        """
+        if parent in self._created_dirs:
+            return
+        with self._dirs_lock:
+            if parent in self._created_dirs:
+                return
+            os.makedirs(parent, exist_ok=True)
+            while parent and parent not in self._created_dirs:
+                self._created_dirs.add(parent)
+                head = os.path.dirname(parent)
+                if head == parent:
+                    break
+                parent = head
+
     def _log_receipt(self, src_path: str, message: str) -> None:
         """Buffer an audit trail entry for a file operation.
         
@@ -180,26 +437,51 @@ class Executioner:
         self.receipt_buffer[parent].append(message)
 
     def _write_trace_receipts(self) -> None:
-        """Write buffered audit trails to image_trace.txt files.
+        """Write buffered audit trails.
         
-        Creates or appends to image_trace.txt in each source folder that had
-        operations, documenting all file movements with timestamp.
+        In the default per_folder mode, creates or appends to image_trace.txt
+        in each source folder that had operations. In central mode, writes
+        one image_trace_<timestamp>.txt in the target root instead, with a
+        header per source folder, so a run touches a single file.
         """
         if not self.receipt_buffer:
             self.logger.info("No files moved, so no receipts written.")
             return
 
+        now = datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        
+        if self.receipts_mode == "central":
+            block = [f"--- Media Consolidator Run: {timestamp} ---"]
+            for folder, lines in self.receipt_buffer.items():
+                block += ["", f"== {folder} ==", *lines]
+            block.append("")
+            trace_path = os.path.join(
+                self.target_root, f"image_trace_{now.strftime('%Y%m%d_%H%M%S')}.txt"
+            )
+            try:
+                os.makedirs(self.target_root, exist_ok=True)
+                with open(trace_path, "ab") as f:
+                    f.write(os.linesep.join(block).encode("utf-8"))
+            except Exception as e:
+                self.logger.warning(f"Failed to write trace to {trace_path}: {e}")
+                return
+            self.logger.info(
+                f"Trace Receipts for {len(self.receipt_buffer)} source folders written to {trace_path}."
+            )
+            return
+
         count = 0
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         for folder, lines in self.receipt_buffer.items():
             try:
                 trace_path = os.path.join(folder, "image_trace.txt")
-                with open(trace_path, "a", encoding="utf-8") as f:
-                    f.write(f"\n--- Media Consolidator Run: {timestamp} ---\n")
-                    for line in lines:
-                        f.write(line + "\n")
+                # One encoded write per folder; os.linesep keeps the line
+                # endings text mode would have produced
+                block = ["", f"--- Media Consolidator Run: {timestamp} ---", *lines, ""]
+                with open(trace_path, "ab") as f:
+                    f.write(os.linesep.join(block).encode("utf-8"))
                 count += 1
             except Exception as e:
                 self.logger.warning(f"Failed to write trace to {folder}: {e}")
 
-        self.logger.info(f"Trace Receipts written to {count} source folders.")
\ No newline at end of file
+        self.logger.info(f"Trace Receipts written to {count} source folders.")
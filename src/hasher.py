@@ -1,7 +1,11 @@
 """File fingerprinting and duplicate detection using content hashing."""
 
 import logging
+import mmap
 import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import xxhash
@@ -10,6 +14,76 @@ import xxhash
 from src.db import DatabaseManager
 from src.cache import HashCache 
 
+# At or below this many candidate rows, unique sizes/partials are counted in
+# Python and marked by id rather than through a window-function UPDATE
+SMALL_CATALOG_ROWS = 10_000
+
+# Hash results are written and committed every this many rows, which keeps
+# memory flat and lets an interrupted run keep the work already done
+UPDATE_BATCH_SIZE = 1000
+
+# Digest used for both partial and full hashes; also tags the persistent cache
+HASH_ALGO = "xxh3_64"
+
+# Below this size one read() is cheaper than setting up and tearing down a
+# mapping; from here up, mmap lets xxhash stream pages at readahead speed
+_MIN_MMAP_SIZE = 1 << 20
+
+# 32-bit builds cannot map files past ~2 GiB; those fall back to chunked reads
+_MAX_MMAP_SIZE = sys.maxsize if sys.maxsize > 2**32 else 2**31 - 1
+
+# madvise is POSIX-only (mmap.MADV_* are missing on Windows)
+_HAS_MADVISE = hasattr(mmap, "MADV_SEQUENTIAL")
+
+# Page cache hints for whole-file reads: posix_fadvise on Linux/BSD, and
+# O_SEQUENTIAL (FILE_FLAG_SEQUENTIAL_SCAN) on Windows
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+_FULL_READ_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0) | getattr(os, "O_SEQUENTIAL", 0)
+
+# How much of an upcoming file to prefetch with POSIX_FADV_WILLNEED
+_READAHEAD_BYTES = 8 * 1024 * 1024
+
+# os.pread is POSIX-only; Windows keeps the buffered open/seek path
+_HAS_PREAD = hasattr(os, "pread")
+
+
+def _readahead(path: str) -> None:
+    """Ask the kernel to start reading the head of a file in the background.
+    
+    Best effort: the range is capped at _READAHEAD_BYTES so a huge video is
+    not pulled into memory ahead of time, and errors are ignored (the real
+    read reports them).
+    
+    Args:
+        path: File that will be hashed soon.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, _READAHEAD_BYTES, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fadvise(fd: int, advice: int) -> None:
+    """Give the kernel a page cache hint for a whole open file.
+    
+    Only a hint: errors are ignored so they can never cost a digest that
+    was (or is about to be) read successfully.
+    
+    Args:
+        fd: Open file descriptor.
+        advice: One of the os.POSIX_FADV_* constants.
+    """
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
 
 class Fingerprinter:
     """Compute file hashes to identify duplicate content.
@@ -21,7 +95,11 @@ class Fingerprinter:
     3. Unique partials: Files with unique partial hashes cannot be duplicates
     4. Full hashes: Complete file hashing for remaining candidates
     
-    This approach avoids expensive full-file reads until necessary.
+    This approach avoids expensive full-file reads until necessary. Each
+    stage finds its groups with COUNT(*) OVER (PARTITION BY ...) in a single
+    pass over the idx_size_partial index (window functions need SQLite 3.25+).
+    Catalogs up to SMALL_CATALOG_ROWS rows are grouped with a Counter in
+    Python instead, which skips SQLite's sort for the unique-marking stages.
     """
 
     def __init__(self, db: DatabaseManager, config: dict[str, Any]) -> None:
@@ -29,14 +107,18 @@ class Fingerprinter:
         
         Args:
             db: Database manager instance.
-            config: Configuration dictionary containing hashing.chunk_size.
+            config: Configuration dictionary containing hashing.chunk_size
+                and optionally hashing.io_concurrency (reader threads).
         """
         self.db = db
         self.logger = logging.getLogger("MediaConsolidator.Hasher")
-        self.chunk_size = config.get("hashing", {}).get("chunk_size", 4096)
+        hash_config = config.get("hashing", {})
+        self.chunk_size = hash_config.get("chunk_size", 4096)
+        # Reads are small and latency-bound; overlapping many keeps the disk queue full
+        self.io_concurrency = hash_config.get("io_concurrency", 32)
 
         target_root = config.get("organization", {}).get("target_root", ".")
-        self.cache = HashCache(target_root)
+        self.cache = HashCache(target_root, hash_algo=HASH_ALGO)
 
     def process_database(self) -> None:
         """Execute the complete four-stage fingerprinting pipeline.
@@ -46,191 +128,384 @@ class Fingerprinter:
         """
         self.logger.info("Starting Fingerprinting process...")
         
-        self._mark_unique_sizes()
-        self._process_partial_hashes()
-        self._mark_unique_partials()
-        self._process_full_hashes()
+        # One connection for all four stages; sqlite3's per-connection
+        # statement cache then compiles each stage's SQL only once. The two
+        # marking stages do not commit; their updates ride along with the
+        # next hashing batch, and anything left is committed at the end.
+        try:
+            with self.db.get_connection() as conn:
+                self._mark_unique_sizes(conn)
+                self._process_partial_hashes(conn)
+                self._mark_unique_partials(conn)
+                self._process_full_hashes(conn)
+                conn.commit()
+        finally:
+            self.cache.close()
         
         self.logger.info("Fingerprinting complete.")
 
-    def _mark_unique_sizes(self) -> None:
+    def _mark_unique_sizes(self, conn: Any) -> None:
         """Identify files with unique sizes and mark as fully processed.
         
         Files with file sizes that appear only once in the database cannot
         be duplicates, so they are marked as hashed without computing any hashes.
+        
+        Args:
+            conn: Database connection shared by all stages.
         """
+        # The unique sizes come from a GROUP BY over the covering
+        # idx_file_size alone, so no table rows are read to find them;
+        # only the matching rows are then looked up and updated
         sql = """
         UPDATE media_files
         SET hashed = 1
-        WHERE id IN (
-            SELECT id FROM media_files 
-            WHERE file_size IN (
-                SELECT file_size FROM media_files 
-                GROUP BY file_size HAVING COUNT(*) = 1
-            )
-            AND hashed = 0
+        WHERE hashed = 0
+        AND file_size IN (
+            SELECT file_size FROM media_files
+            WHERE file_size IS NOT NULL
+            GROUP BY file_size
+            HAVING COUNT(*) = 1
         )
         """
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(sql)
-            if cursor.rowcount > 0:
-                self.logger.info(f"Skipped hashing for {cursor.rowcount} files with unique sizes.")
-            conn.commit()
+        sql_small = f"""
+        SELECT id, file_size, hashed FROM media_files
+        WHERE file_size IS NOT NULL
+        LIMIT {SMALL_CATALOG_ROWS + 1}
+        """
+        rows = conn.execute(sql_small).fetchall()
+        if len(rows) <= SMALL_CATALOG_ROWS:
+            counts = Counter(size for _, size, _ in rows)
+            marked = self._mark_hashed(
+                conn, [row_id for row_id, size, hashed in rows if counts[size] == 1 and not hashed]
+            )
+        else:
+            marked = conn.execute(sql).rowcount
+        if marked > 0:
+            self.logger.info(f"Skipped hashing for {marked} files with unique sizes.")
 
-    def _process_partial_hashes(self) -> None:
+    def _process_partial_hashes(self, conn: Any) -> None:
         """Compute partial hashes for files sharing sizes.
         
         Reads start and end chunks of files that share the same file size,
         allowing efficient detection of non-duplicates before full reads.
-        Small files (≤2 chunks) use only the start chunk.
+        Small files (≤2 chunks) are read whole.
+        
+        Args:
+            conn: Database connection shared by all stages.
         """
         sql_select = """
-        SELECT id, file_path, file_size FROM media_files
-        WHERE file_size IN (
-            SELECT file_size FROM media_files 
-            GROUP BY file_size HAVING COUNT(*) > 1
+        WITH sized AS (
+            SELECT id, file_path, file_size, modified_at, hash_partial, hashed,
+                   COUNT(*) OVER (PARTITION BY file_size) AS size_cnt
+            FROM media_files
+            WHERE file_size IS NOT NULL
         )
+        SELECT id, file_path, file_size, modified_at FROM sized
+        WHERE size_cnt > 1
         AND hash_partial IS NULL
         AND hashed = 0
         """
         
-        updates: list[tuple[str, int]] = []
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(sql_select)
-            rows = cursor.fetchall()
-            
-            if rows:
-                self.logger.info(f"Computing Partial Hashes for {len(rows)} candidates...")
-            
-            for row_id, path, size in rows:
-                p_hash = self._compute_partial_hash(path, size)
+        sql_update = "UPDATE media_files SET hash_partial = ? WHERE id = ?"
+        
+        updates: list[tuple[bytes, int]] = []
+        cursor = conn.execute(sql_select)
+        rows = cursor.fetchall()
+        
+        if rows:
+            self.logger.info(f"Computing Partial Hashes for {len(rows)} candidates...")
+        
+        # Unchanged files (same path, size and mtime) reuse last run's partial.
+        # Small files are read whole either way, so they are not cached.
+        small_limit = self.chunk_size * 2
+        known = self.cache.get_partials(
+            [(path, size, mtime) for _, path, size, mtime in rows if size > small_limit],
+            self.chunk_size,
+        )
+        to_read = []
+        for row_id, path, size, mtime in rows:
+            cached_partial = known.get((path, size, mtime)) if size > small_limit else None
+            if cached_partial:
+                updates.append((cached_partial, row_id))
+            else:
+                to_read.append((row_id, path, size, mtime))
+        
+        if updates:
+            self.logger.info(f"Partial Cache Hits: {len(updates)} files skipped partial reading.")
+            self._write_updates(conn, sql_update, updates)
+        
+        new_partials = []
+        with ThreadPoolExecutor(max_workers=self.io_concurrency) as executor:
+            hashes = executor.map(self._compute_partial_hash,
+                                  [path for _, path, _, _ in to_read],
+                                  [size for _, _, size, _ in to_read])
+            for (row_id, path, size, mtime), p_hash in zip(to_read, hashes):
                 if p_hash:
                     updates.append((p_hash, row_id))
+                    if size > small_limit:
+                        new_partials.append((path, size, mtime, p_hash))
+                    if len(updates) >= UPDATE_BATCH_SIZE:
+                        self._write_updates(conn, sql_update, updates)
+                        self.cache.put_partial_many(new_partials, self.chunk_size)
+                        new_partials.clear()
 
-            if updates:
-                conn.executemany("UPDATE media_files SET hash_partial = ? WHERE id = ?", updates)
-                conn.commit()
+        self._write_updates(conn, sql_update, updates)
+        self.cache.put_partial_many(new_partials, self.chunk_size)
 
-    def _mark_unique_partials(self) -> None:
+    def _mark_unique_partials(self, conn: Any) -> None:
         """Identify files with unique partial hashes and mark as processed.
         
         Among files sharing the same size, if a partial hash is unique,
         the file cannot be a duplicate and is marked as complete.
+        
+        Args:
+            conn: Database connection shared by all stages.
         """
         sql = """
-        UPDATE media_files
-        SET hashed = 1
-        WHERE id IN (
-            SELECT id FROM media_files 
+        WITH partials AS (
+            SELECT id, COUNT(*) OVER (PARTITION BY file_size, hash_partial) AS partial_cnt
+            FROM media_files
             WHERE hash_partial IS NOT NULL 
             AND hashed = 0
-            GROUP BY file_size, hash_partial 
-            HAVING COUNT(*) = 1
         )
+        UPDATE media_files
+        SET hashed = 1
+        WHERE id IN (SELECT id FROM partials WHERE partial_cnt = 1)
         """
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(sql)
-            if cursor.rowcount > 0:
-                self.logger.info(f"Marked {cursor.rowcount} unique partial hashes as processed.")
-            conn.commit()
+        sql_small = f"""
+        SELECT id, file_size, hash_partial FROM media_files
+        WHERE hash_partial IS NOT NULL 
+        AND hashed = 0
+        LIMIT {SMALL_CATALOG_ROWS + 1}
+        """
+        rows = conn.execute(sql_small).fetchall()
+        if len(rows) <= SMALL_CATALOG_ROWS:
+            counts = Counter((size, p_hash) for _, size, p_hash in rows)
+            marked = self._mark_hashed(
+                conn, [row_id for row_id, size, p_hash in rows if counts[(size, p_hash)] == 1]
+            )
+        else:
+            marked = conn.execute(sql).rowcount
+        if marked > 0:
+            self.logger.info(f"Marked {marked} unique partial hashes as processed.")
 
-    def _process_full_hashes(self) -> None:
+    def _mark_hashed(self, conn: Any, ids: list[int]) -> int:
+        """Mark specific rows as fully processed.
+        
+        Args:
+            conn: Database connection object.
+            ids: Row ids to mark.
+            
+        Returns:
+            Number of rows marked.
+        """
+        conn.executemany("UPDATE media_files SET hashed = 1 WHERE id = ?", [(i,) for i in ids])
+        return len(ids)
+
+    def _process_full_hashes(self, conn: Any) -> None:
         """Compute full hashes for high-probability duplicates.
         
         Checks the persistent cache first to avoid re-reading files that have
         been processed in previous runs.
+        
+        Args:
+            conn: Database connection shared by all stages.
         """
         
         sql_select = """
-        SELECT id, file_path, file_size, hash_partial FROM media_files
-        WHERE (file_size, hash_partial) IN (
-            SELECT file_size, hash_partial FROM media_files
-            WHERE hash_partial IS NOT NULL
-            GROUP BY file_size, hash_partial HAVING COUNT(*) > 1
+        WITH partials AS (
+            SELECT id, file_path, file_size, hash_partial, hash_full,
+                   COUNT(*) OVER (PARTITION BY file_size, hash_partial) AS partial_cnt
+            FROM media_files
+            WHERE file_size IS NOT NULL
+            AND hash_partial IS NOT NULL
         )
+        SELECT id, file_path, file_size, hash_partial FROM partials
+        WHERE partial_cnt > 1
         AND hash_full IS NULL
         """
         
-        updates: list[tuple[str, int, int]] = []
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(sql_select)
-            rows = cursor.fetchall()
-            
-            if rows:
-                self.logger.info(f"Resolving Full Hashes for {len(rows)} high-probability duplicates...")
+        sql_update = "UPDATE media_files SET hash_full = ?, hashed = ? WHERE id = ?"
+        
+        updates: list[tuple[bytes, int, int]] = []
+        cursor = conn.execute(sql_select)
+        rows = cursor.fetchall()
+        
+        if rows:
+            self.logger.info(f"Resolving Full Hashes for {len(rows)} high-probability duplicates...")
+        
+        cache_hits = 0
+        small_limit = self.chunk_size * 2
+        known = self.cache.get_many(
+            [(size, p_hash) for _, _, size, p_hash in rows if size > small_limit]
+        )
+        
+        # 1. Check Cache; group the misses so each signature is read once.
+        # Small files were read whole, so their partial already is the full hash.
+        to_read: dict[tuple[int, bytes], list[tuple[int, str]]] = {}
+        for row_id, path, size, p_hash in rows:
+            if size <= small_limit:
+                updates.append((p_hash, 1, row_id))
+                continue
+            cached_full = known.get((size, p_hash))
+            if cached_full:
+                updates.append((cached_full, 1, row_id))
+                cache_hits += 1
+            else:
+                to_read.setdefault((size, p_hash), []).append((row_id, path))
+        
+        if len(updates) >= UPDATE_BATCH_SIZE:
+            self._write_updates(conn, sql_update, updates)
+        
+        # 2. Compute and Cache
+        if to_read:
+            path_groups = [[path for _, path in group] for group in to_read.values()]
+            # While task i runs, warm the file that will take its worker
+            # slot next, so its first reads hit the page cache
+            ahead = self.io_concurrency
             
-            cache_hits = 0
+            def hash_group(i: int) -> bytes | None:
+                if _HAS_FADVISE and i + ahead < len(path_groups):
+                    _readahead(path_groups[i + ahead][0])
+                return self._compute_first_full_hash(path_groups[i])
             
-            for row_id, path, size, p_hash in rows:
-                # 1. Check Cache
-                cached_full = self.cache.get_full_hash(size, p_hash)
-                
-                if cached_full:
-                    updates.append((cached_full, 1, row_id))
-                    cache_hits += 1
-                else:
-                    # 2. Compute and Cache
-                    f_hash = self._compute_full_hash(path)
+            with ThreadPoolExecutor(max_workers=self.io_concurrency) as executor:
+                hashes = executor.map(hash_group, range(len(path_groups)))
+                for ((size, p_hash), group), f_hash in zip(to_read.items(), hashes):
                     if f_hash:
                         self.cache.put_full_hash(size, p_hash, f_hash)
-                        updates.append((f_hash, 1, row_id))
+                        updates.extend((f_hash, 1, row_id) for row_id, _ in group)
+                        if len(updates) >= UPDATE_BATCH_SIZE:
+                            self._write_updates(conn, sql_update, updates)
 
-            if cache_hits > 0:
-                self.logger.info(f"Cache Hits: {cache_hits} files skipped full reading.")
+        if cache_hits > 0:
+            self.logger.info(f"Cache Hits: {cache_hits} files skipped full reading.")
 
-            if updates:
-                conn.executemany("UPDATE media_files SET hash_full = ?, hashed = ? WHERE id = ?", updates)
-                conn.commit()
+        self.cache.flush(force=True)
+        self._write_updates(conn, sql_update, updates)
+
+    def _write_updates(self, conn: Any, sql: str, updates: list[tuple]) -> None:
+        """Write and commit a batch of hash updates, then empty the list.
+        
+        Args:
+            conn: Database connection object.
+            sql: Parameterized UPDATE statement.
+            updates: Parameter tuples for sql; cleared after writing.
+        """
+        if updates:
+            conn.executemany(sql, updates)
+            conn.commit()
+            updates.clear()
 
-    def _compute_partial_hash(self, path: str, file_size: int) -> str | None:
+    def _compute_partial_hash(self, path: str, file_size: int) -> bytes | None:
         """Compute a partial hash from start and end chunks of a file.
         
         Reads the first chunk and (if file is large enough) the last chunk,
         then hashes them together. This provides fast duplicate detection
-        without reading the entire file.
+        without reading the entire file. The end chunk is located from the
+        indexed file_size, which is what candidates were grouped on.
+        Files of at most two chunks are read whole, so their partial hash
+        is already the full hash and the full stage reuses it.
         
         Args:
             path: File path to hash.
             file_size: Size of the file in bytes.
             
         Returns:
-            Hex digest string if successful, None if file could not be read.
+            Raw 8-byte digest if successful, None if file could not be read.
         """
         try:
-            with open(path, 'rb') as f:
-                start_chunk = f.read(self.chunk_size)
-                if file_size <= (self.chunk_size * 2):
-                    end_chunk = b""
-                else:
-                    f.seek(-self.chunk_size, os.SEEK_END)
-                    end_chunk = f.read(self.chunk_size)
-                
-                hasher = xxhash.xxh64()
-                hasher.update(start_chunk)
-                hasher.update(end_chunk)
-                return hasher.hexdigest()
+            if _HAS_PREAD:
+                # Raw descriptor + positional reads: no buffered-file object,
+                # no seek, just open/pread/pread/close
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    if file_size <= (self.chunk_size * 2):
+                        start_chunk = os.pread(fd, file_size, 0)
+                        end_chunk = b""
+                    else:
+                        start_chunk = os.pread(fd, self.chunk_size, 0)
+                        end_chunk = os.pread(fd, self.chunk_size, file_size - self.chunk_size)
+                finally:
+                    os.close(fd)
+            else:
+                with open(path, 'rb') as f:
+                    if file_size <= (self.chunk_size * 2):
+                        start_chunk = f.read(file_size)
+                        end_chunk = b""
+                    else:
+                        start_chunk = f.read(self.chunk_size)
+                        f.seek(-self.chunk_size, os.SEEK_END)
+                        end_chunk = f.read(self.chunk_size)
+            
+            # One-shot digest: a single C call instead of a hasher object
+            # plus two updates (same value as hashing the chunks in turn)
+            return xxhash.xxh3_64_digest(start_chunk + end_chunk)
         except OSError:
             self.logger.error(f"Could not read file: {path}")
             return None
 
-    def _compute_full_hash(self, path: str) -> str | None:
+    def _compute_full_hash(self, path: str) -> bytes | None:
         """Compute a complete content hash of a file.
         
-        Reads the entire file in chunks and produces a definitive hash
-        for duplicate identification.
+        Files of 1 MiB and up are mapped and hashed with one-shot
+        xxh3_64_digest, so xxhash walks the whole mapping in C. Smaller
+        files (including empty ones) are read in a single call, and files
+        that cannot be mapped (too large for a 32-bit address space, or
+        truncated after they were sized) are read in chunks instead.
         
         Args:
             path: File path to hash.
             
         Returns:
-            Hex digest string if successful, None if file could not be read.
+            Raw 8-byte digest if successful, None if file could not be read.
         """
         try:
-            hasher = xxhash.xxh64()
-            with open(path, 'rb') as f:
-                while chunk := f.read(65536):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
-        except OSError:
+            digest = None
+            with open(os.open(path, _FULL_READ_FLAGS), 'rb') as f:
+                fd = f.fileno()
+                if _HAS_FADVISE:
+                    _fadvise(fd, os.POSIX_FADV_SEQUENTIAL)
+                size = os.fstat(fd).st_size
+                if size < _MIN_MMAP_SIZE:
+                    digest = xxhash.xxh3_64_digest(f.read())
+                elif size <= _MAX_MMAP_SIZE:
+                    try:
+                        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+                            if _HAS_MADVISE:
+                                try:
+                                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                                except OSError:
+                                    pass
+                            digest = xxhash.xxh3_64_digest(mm)
+                    except ValueError:
+                        # Truncated since fstat: hash what is actually there
+                        pass
+                if digest is None:
+                    hasher = xxhash.xxh3_64()
+                    while chunk := f.read(65536):
+                        hasher.update(chunk)
+                    digest = hasher.digest()
+                # Each file is read once; drop its pages so they do not evict
+                # the SQLite index and directory metadata
+                if _HAS_FADVISE:
+                    _fadvise(fd, os.POSIX_FADV_DONTNEED)
+            return digest
+        except (OSError, ValueError):
             self.logger.error(f"Could not read file: {path}")
-            return None
\ No newline at end of file
+            return None
+
+    def _compute_first_full_hash(self, paths: list[str]) -> bytes | None:
+        """Full-hash the first readable file among same-signature candidates.
+        
+        Args:
+            paths: Paths sharing one (size, partial hash) signature.
+            
+        Returns:
+            Raw 8-byte digest, or None if none of the files could be read.
+        """
+        for path in paths:
+            f_hash = self._compute_full_hash(path)
+            if f_hash:
+                return f_hash
+        return None
@@ -1,14 +1,193 @@
 """Media file organization planning with collision detection."""
 
+import functools
 import logging
 import os
 import re
+import string
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from pathlib import Path
 from typing import Any
 
 from src.db import DatabaseManager
-from src.utils import resolve_best_timestamp 
+from src.utils import MIN_VALID_TIMESTAMP
+
+# Plans larger than this compute their target paths in a process pool
+_PARALLEL_PLAN_THRESHOLD = 2000
+
+# Rows handed to a plan worker per task
+_PLAN_CHUNK_SIZE = 2048
+
+# KEEP rows fetched, planned and written per round of generate_organization_plan
+_PLAN_PAGE_SIZE = 10_000
+
+# Local midnight always falls on a 15-minute boundary (UTC offsets and DST
+# shifts are multiples of 15 minutes), so every timestamp in one bucket has
+# the same local date
+_DATE_BUCKET_SECONDS = 900
+
+# Windows paths differing only by case are the same place
+_CASE_INSENSITIVE_FS = os.name == 'nt'
+
+_DATE_PREFIX_PATTERN = re.compile(r'^\d{4}[-_]\d{2}[-_]\d{2}[-_ ]?')
+_FOLDER_CLEAN_PATTERN = re.compile(r'[^\w\-]')
+
+# ASCII characters outside [A-Za-z0-9_-] map to '_', the same rule as
+# _FOLDER_CLEAN_PATTERN; non-ASCII names still go through the regex
+_FOLDER_CLEAN_TABLE = str.maketrans({
+    chr(i): '_' for i in range(128) if not (chr(i).isalnum() or chr(i) in '_-')
+})
+
+# Placeholders a filename template may use, in the compiled function's argument order
+_TEMPLATE_FIELDS = ("date", "name", "folder")
+
+
+def _default_name(date: str, name: str, folder: str) -> str:
+    """Fallback naming scheme for templates that cannot be used."""
+    return f"{date}_{name}"
+
+
+@functools.lru_cache(maxsize=8)
+def compile_filename_template(template: str) -> Callable[[str, str, str], str] | None:
+    """Compile a filename template into a function of (date, name, folder).
+    
+    The template is parsed once and turned into a plain string
+    concatenation, so planning does not re-parse it or build a dict per
+    file. Literal text is embedded with repr(), so no template content is
+    ever evaluated. Templates using conversions or format specs fall back
+    to str.format.
+    
+    Args:
+        template: Template string such as "{date}_{name}_from_{folder}".
+        
+    Returns:
+        The compiled function, or None if the template is malformed or uses
+        placeholders other than {date}, {name} and {folder}.
+    """
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError:
+        return None
+    
+    terms = []
+    plain = True
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            terms.append(repr(literal))
+        if field is None:
+            continue
+        if field not in _TEMPLATE_FIELDS:
+            return None
+        plain = plain and not spec and not conversion
+        terms.append(field)
+    
+    if not plain:
+        return lambda date, name, folder: template.format(date=date, name=name, folder=folder)
+    
+    source = f"def _format_name(date, name, folder):\n    return {' + '.join(terms) or repr('')}\n"
+    namespace: dict[str, Any] = {}
+    exec(source, namespace)
+    return namespace["_format_name"]
+
+
+@functools.lru_cache(maxsize=65536)
+def _local_date(bucket: int) -> str:
+    """Format the local date (YYYY-MM-DD) of a _DATE_BUCKET_SECONDS bucket.
+    
+    Files from the same burst or import day share buckets, so most rows
+    reuse an already formatted date instead of calling strftime.
+    
+    Args:
+        bucket: Timestamp divided by _DATE_BUCKET_SECONDS, rounded down.
+        
+    Returns:
+        The local date string.
+    """
+    return datetime.fromtimestamp(bucket * _DATE_BUCKET_SECONDS).strftime("%Y-%m-%d")
+
+
+@functools.lru_cache(maxsize=4096)
+def _clean_folder(raw_folder: str) -> str:
+    """Replace non-word characters other than '-' in a folder name with underscores.
+    
+    Rows arrive grouped by folder (one import or camera dump per folder), so
+    each distinct name is cleaned once and then served from the cache.
+    
+    Args:
+        raw_folder: Source folder name.
+        
+    Returns:
+        The cleaned folder name.
+    """
+    if raw_folder.isascii():
+        return raw_folder.translate(_FOLDER_CLEAN_TABLE)
+    return _FOLDER_CLEAN_PATTERN.sub('_', raw_folder)
+
+
+def _plan_target(row: tuple[int, str, float, str], target_root: str, template: str) -> str:
+    """Compute a KEEP file's target path before collision resolution.
+    
+    Depends only on its arguments, so it can run in a worker process.
+    
+    Args:
+        row: Tuple (id, file_path, best_ts, file_ext), where best_ts is
+            the resolved oldest plausible timestamp.
+        target_root: Absolute, forward-slash target root.
+        template: Filename template string.
+        
+    Returns:
+        The full target path.
+    """
+    _, src_path, best_ts, ext = row
+    format_name = compile_filename_template(template) or _default_name
+    
+    # Step 1: Date for organization (best_ts was resolved by the query).
+    # The year and month folders are prefixes of it
+    date_prefix = _local_date(int(best_ts // _DATE_BUCKET_SECONDS))
+    year_folder = date_prefix[:4]
+    month_folder = date_prefix[:7]
+
+    # Step 2: Determine naming strategy
+    # Stored paths are normally forward-slash already; skip the copy then
+    norm_src = src_path.replace('\\', '/') if '\\' in src_path else src_path
+    if _CASE_INSENSITIVE_FS:
+        root_len = len(target_root)
+        is_already_organized = norm_src[:root_len].lower() == target_root.lower()
+    else:
+        is_already_organized = norm_src.startswith(target_root)
+    
+    # Split the name with rfind rather than building a Path; same stem as
+    # Path.stem (a leading or trailing dot is not a suffix)
+    slash = norm_src.rfind('/')
+    name = norm_src[slash + 1:]
+    dot = name.rfind('.')
+    original_stem = name[:dot] if 0 < dot < len(name) - 1 else name
+    # Anchored match + slice: no new string when there is no prefix. The
+    # prefix must start with a digit, so most camera names (IMG_, DSC)
+    # skip the regex call entirely.
+    prefix = _DATE_PREFIX_PATTERN.match(original_stem) if original_stem[:1].isdigit() else None
+    clean_stem = original_stem[prefix.end():] if prefix else original_stem
+    if not clean_stem:
+        clean_stem = original_stem
+
+    if is_already_organized:
+        # A: File is already in the target structure; retain existing name
+        new_filename_stem = f"{date_prefix}_{clean_stem}"
+    else:
+        # B: File is from external source; apply naming template
+        # Path.parent.name; a drive root ("C:") has no folder name
+        raw_folder = norm_src[norm_src.rfind('/', 0, max(slash, 0)) + 1:max(slash, 0)]
+        if raw_folder.endswith(':'):
+            raw_folder = ''
+        clean_folder = _clean_folder(raw_folder)
+        
+        # Schema from configuration template (compiled once per template)
+        new_filename_stem = format_name(date_prefix, clean_stem, clean_folder)
+    
+    # Step 3: Construct target path; every part is already forward-slash
+    return f"{target_root}/{year_folder}/{month_folder}/{new_filename_stem}{ext}"
 
 
 class Librarian:
@@ -34,23 +213,25 @@ class Librarian:
         
         org_config = config.get("organization", {})
         target_raw = org_config.get("target_root", "C:/Photos")
-        self.target_root = target_raw.replace('\\', '/')
+        # No trailing slash, so targets can be built by concatenation
+        self.target_root = os.path.abspath(target_raw).replace('\\', '/').rstrip('/')
         
         self.filename_template = org_config.get("filename_template", "{date}_{name}")
+        if compile_filename_template(self.filename_template) is None:
+            self.logger.warning(
+                f"Unusable filename_template {self.filename_template!r}; using '{{date}}_{{name}}'."
+            )
         
         self.ensure_schema()
-        
-        self.date_prefix_pattern = re.compile(r'^\d{4}[-_]\d{2}[-_]\d{2}[-_ ]?')
-        self.folder_clean_pattern = re.compile(r'[^\w\-]')
 
     def ensure_schema(self) -> None:
         """Add target_path column to media_files table if it doesn't exist."""
         with self.db.get_connection() as conn:
-            try:
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(media_files)")}
+            # No columns means no table yet; initialize_schema creates it with target_path
+            if cols and "target_path" not in cols:
                 conn.execute("ALTER TABLE media_files ADD COLUMN target_path TEXT")
                 conn.commit()
-            except Exception:
-                pass
 
     def generate_organization_plan(self) -> None:
         """Generate target paths for all KEEP files.
@@ -62,99 +243,131 @@ class Librarian:
         3. Applying the appropriate naming scheme and template
         4. Resolving path collisions by appending numeric suffixes
         
-        Results are stored in the media_files.target_path column.
+        Steps 1-3 depend only on the row, so large plans compute them in a
+        process pool; collisions are then resolved serially in row order.
+        KEEP rows are read in id-ordered pages of _PLAN_PAGE_SIZE so memory
+        stays flat, and each page's targets are written before the next is
+        fetched. Results are stored in the media_files.target_path column.
         """
         self.logger.info("Generating organization plan...")
         
-        sql = """
-        SELECT id, file_path, created_at, modified_at, file_ext 
+        sql_count = "SELECT COUNT(*) FROM media_files WHERE disposition = 'KEEP'"
+        # best_ts is resolve_best_timestamp(created_at, modified_at), done in SQL
+        sql_page = f"""
+        SELECT id, file_path,
+               CASE
+                   WHEN created_at > :min_ts AND modified_at > :min_ts THEN MIN(created_at, modified_at)
+                   WHEN created_at > :min_ts THEN created_at
+                   WHEN modified_at > :min_ts THEN modified_at
+                   ELSE MAX(created_at, modified_at)
+               END AS best_ts,
+               file_ext 
         FROM media_files 
-        WHERE disposition = 'KEEP'
+        WHERE disposition = 'KEEP' AND id > :last_id
+        ORDER BY id LIMIT {_PLAN_PAGE_SIZE}
         """
         
-        updates: list[tuple[str, int]] = []
         path_registry: dict[str, int] = {}
+        # Every target starts with "<target_root>/"; registry keys skip it
+        key_start = len(self.target_root) + 1
+        planner = functools.partial(
+            _plan_target, target_root=self.target_root, template=self.filename_template
+        )
 
         with self.db.get_connection() as conn:
-            cursor = conn.execute(sql)
-            rows = cursor.fetchall()
+            total = conn.execute(sql_count).fetchone()[0]
             
-            self.logger.info(f"Planning moves for {len(rows)} files...")
-
-            for row_id, src_path, c_time, m_time, ext in rows:
-                # Step 1: Determine best date for organization
-                best_ts = resolve_best_timestamp(c_time, m_time)
-                dt = datetime.fromtimestamp(best_ts)
-                
-                year_folder = dt.strftime("%Y")
-                month_folder = dt.strftime("%Y-%m")
-                date_prefix = dt.strftime("%Y-%m-%d")
-
-                # Step 2: Determine naming strategy
-                src_p = Path(src_path)
-                norm_src = src_path.replace('\\', '/')
-                is_already_organized = norm_src.startswith(self.target_root)
-                
-                original_stem = src_p.stem
-                clean_stem = self.date_prefix_pattern.sub('', original_stem)
-                if not clean_stem:
-                    clean_stem = original_stem
-
-                if is_already_organized:
-                    # A: File is already in the target structure; retain existing name
-                    new_filename_stem = f"{date_prefix}_{clean_stem}"
-                else:
-                    # B: File is from external source; apply naming template
-                    raw_folder = src_p.parent.name
-                    clean_folder = self.folder_clean_pattern.sub('_', raw_folder)
-                    
-                    # Schema from configuration template, modifiable here:
-                    name_map = {
-                        "date": date_prefix,
-                        "name": clean_stem,
-                        "folder": clean_folder
-                    }
-                    try:
-                        new_filename_stem = self.filename_template.format(**name_map)
-                    except KeyError:
-                        new_filename_stem = f"{date_prefix}_{clean_stem}"
-                
-                # Step 3: Construct target path and resolve collisions
-                safe_name = f"{new_filename_stem}{ext}"
-                relative_path = os.path.join(year_folder, month_folder, safe_name)
-                full_target = os.path.join(self.target_root, relative_path).replace('\\', '/')
-                
-                final_target = self._resolve_collision(full_target, path_registry)
-                updates.append((final_target, row_id))
-
-            if updates:
-                conn.executemany("UPDATE media_files SET target_path = ? WHERE id = ?", updates)
-                conn.commit()
+            self.logger.info(f"Planning moves for {total} files...")
+
+            if total > _PARALLEL_PLAN_THRESHOLD:
+                pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+            else:
+                pool = nullcontext()
+            with pool as executor:
+                last_id = 0
+                while rows := conn.execute(
+                    sql_page, {"min_ts": MIN_VALID_TIMESTAMP, "last_id": last_id}
+                ).fetchall():
+                    last_id = rows[-1][0]
+                    if executor:
+                        targets = executor.map(planner, rows, chunksize=_PLAN_CHUNK_SIZE)
+                    else:
+                        targets = map(planner, rows)
+
+                    # Collisions are resolved as executemany pulls each row
+                    updates = (
+                        (row[0], self._resolve_collision(full_target, path_registry, key_start))
+                        for row, full_target in zip(rows, targets)
+                    )
+                    self._apply_plan(conn, updates)
+                    conn.commit()
+
+    def _apply_plan(self, conn: Any, updates: Iterable[tuple[int, str]]) -> None:
+        """Write planned target paths.
+        
+        Stages the paths in a keyed temp table and applies them in one
+        UPDATE instead of one statement per row. The table is emptied
+        rather than dropped, so later pages reuse it without a schema
+        change (which would force every cached statement to re-prepare).
+        
+        Args:
+            conn: Database connection object.
+            updates: Tuples (id, target_path); consumed once, so a
+                generator avoids building the page's list.
+        """
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _plan_updates (
+                id INTEGER PRIMARY KEY, target_path TEXT
+            )
+        """)
+        conn.executemany("INSERT INTO _plan_updates VALUES (?, ?)", updates)
+        conn.execute("""
+            UPDATE media_files 
+            SET target_path = (SELECT target_path FROM _plan_updates p WHERE p.id = media_files.id)
+            WHERE id IN (SELECT id FROM _plan_updates)
+        """)
+        conn.execute("DELETE FROM _plan_updates")
 
-    def _resolve_collision(self, target_path: str, registry: dict[str, int]) -> str:
+    def _resolve_collision(self, target_path: str, registry: dict[str, int], key_start: int = 0) -> str:
         """Resolve path collisions by appending numeric suffixes.
         
         If a target path has already been assigned, appends a counter to the
-        filename and recursively checks the new path. Uses case-insensitive
-        matching to handle filesystem case sensitivity differences.
+        filename and checks the new path, repeating until a free one is found.
+        Uses case-insensitive matching to handle filesystem case sensitivity
+        differences. The registry stays in Python rather than a NOCASE index
+        because str.lower() also folds non-ASCII names.
         
         Args:
             target_path: The desired target path.
             registry: Dict mapping lowercase paths to occurrence counts.
+            key_start: Length of a prefix shared by every registered path
+                (such as the target root); it is left out of the keys so it
+                is not lowercased again for each file.
             
         Returns:
             A unique path with numeric suffix appended if needed.
         """
-        lower_path = target_path.lower()
+        lower_path = target_path[key_start:].lower()
         if lower_path not in registry:
             registry[lower_path] = 1
             return target_path
         
-        registry[lower_path] += 1
-        count = registry[lower_path]
+        # Split once; only the stem changes between attempts
+        slash = max(target_path.rfind('/'), key_start - 1)
+        dot = target_path.rfind('.')
+        if dot <= slash + 1:
+            dot = len(target_path)
+        parent = target_path[:slash + 1]
+        parent_lower = lower_path[:slash + 1 - key_start]
+        stem = target_path[slash + 1:dot]
+        suffix = target_path[dot:]
         
-        p = Path(target_path)
-        new_name = f"{p.stem}_{count}{p.suffix}"
-        new_path = str(p.parent / new_name).replace('\\', '/')
+        while lower_path in registry:
+            registry[lower_path] += 1
+            stem = f"{stem}_{registry[lower_path]}"
+            tail = stem + suffix
+            target_path = parent + tail
+            lower_path = parent_lower + tail.lower()
         
-        return self._resolve_collision(new_path, registry)
\ No newline at end of file
+        registry[lower_path] = 1
+        return target_path
@@ -7,35 +7,98 @@ import random
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
-from ctypes import windll, wintypes, byref
+import ctypes
+from ctypes import wintypes, byref
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 MIN_VALID_TIMESTAMP = 315619200.0
 _LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
+# Win32 file time API, bound once with explicit signatures so calls skip
+# ctypes' per-call argument guessing. A private kernel32 instance keeps
+# these argtypes from leaking into other windll users.
+_GENERIC_WRITE = 0x40000000
+_FILE_WRITE_ATTRIBUTES = 0x100
+_FILE_SHARE_ALL = 0x7
+_OPEN_EXISTING = 3
+_FILE_ATTRIBUTE_NORMAL = 0x80
+_INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+if os.name == 'nt':
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    
+    _CreateFileW = _kernel32.CreateFileW
+    _CreateFileW.argtypes = [
+        wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+        wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE,
+    ]
+    _CreateFileW.restype = wintypes.HANDLE
+    
+    _LPFILETIME = ctypes.POINTER(wintypes.FILETIME)
+    _SetFileTime = _kernel32.SetFileTime
+    _SetFileTime.argtypes = [wintypes.HANDLE, _LPFILETIME, _LPFILETIME, _LPFILETIME]
+    _SetFileTime.restype = wintypes.BOOL
+    
+    _CloseHandle = _kernel32.CloseHandle
+    _CloseHandle.argtypes = [wintypes.HANDLE]
+    _CloseHandle.restype = wintypes.BOOL
+
+# Parsed configs by path, with the file mtime (ns) they were read at
+_CONFIG_CACHE: dict[str, tuple[int, dict[str, Any]]] = {}
+
 
 def normalize_path(path_str: str) -> str:
     """Normalize a file path to use forward slashes and remove quotes."""
     if not path_str:
         return ""
+    # Already normalized: no backslashes and no surrounding quotes
+    if '\\' not in path_str and path_str[0] not in '\'"' and path_str[-1] not in '\'"':
+        return path_str
     clean = path_str.strip('\'"')
     return clean.replace('\\', '/')
 
 
+class _SlashReader:
+    """File wrapper that turns backslashes into forward slashes as it is read.
+    
+    Windows paths in the YAML (even double-quoted ones, where a backslash
+    would start an escape) then parse as forward-slash paths, without
+    holding a second sanitized copy of the whole file.
+    """
+
+    def __init__(self, f: Any) -> None:
+        self.f = f
+
+    def read(self, size: int = -1) -> str:
+        """Read up to size characters, with backslashes replaced."""
+        return self.f.read(size).replace('\\', '/')
+
+
 def load_config(config_path: str = "config/settings.yaml") -> dict[str, Any]:
-    """Load and normalize configuration from a YAML file."""
-    path = Path(config_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Configuration file not found at: {path.absolute()}")
+    """Load and normalize configuration from a YAML file.
     
-    with open(path, 'r', encoding='utf-8') as f:
-        raw_content = f.read()
+    Results are cached per path and reused until the file's mtime changes,
+    so callers share one parsed dict and must treat it as read-only.
+    """
+    path = Path(config_path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file not found at: {path.absolute()}") from None
     
-    sanitized_content = raw_content.replace('\\', '/')
+    cached = _CONFIG_CACHE.get(config_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
     
     try:
-        config = yaml.safe_load(sanitized_content)
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml.load(_SlashReader(f), Loader=_YamlLoader)
     except yaml.YAMLError as e:
         raise yaml.YAMLError(f"Error parsing YAML: {e}") from e
     
@@ -47,6 +110,7 @@ def load_config(config_path: str = "config/settings.yaml") -> dict[str, Any]:
     if 'source_dirs' in org:
         org['source_dirs'] = [normalize_path(p) for p in org['source_dirs']]
     
+    _CONFIG_CACHE[config_path] = (mtime, config)
     return config
 
 
@@ -130,14 +194,43 @@ def resolve_best_timestamp(created_ts: float, modified_ts: float) -> float:
         return max(created_ts, modified_ts)
 
 
-def set_file_creation_time(path: str, timestamp: float) -> bool:
-    """Set the Windows Creation Time (Birthtime) to a specific timestamp.
+def _to_filetime(timestamp: float, ft: wintypes.FILETIME | None = None) -> wintypes.FILETIME:
+    """Convert a Unix timestamp to a Windows FILETIME structure.
     
-    Uses Win32 API via ctypes. Safe to call on non-Windows systems (returns False).
+    Fills ft in place when given, so batch callers can reuse one struct.
+    """
+    # 100ns intervals since Jan 1, 1601
+    wintime = int((timestamp * 10000000) + 116444736000000000)
+    if ft is None:
+        ft = wintypes.FILETIME()
+    ft.dwLowDateTime = wintime & 0xFFFFFFFF
+    ft.dwHighDateTime = wintime >> 32
+    return ft
+
+
+def _open_for_times(path: str, access: int, share: int) -> int | None:
+    """Open an existing file for timestamp updates.
+    
+    Returns:
+        The Win32 handle, or None if the file could not be opened.
+    """
+    handle = _CreateFileW(path, access, share, None, _OPEN_EXISTING, _FILE_ATTRIBUTE_NORMAL, None)
+    if handle is None or handle == _INVALID_HANDLE_VALUE:
+        return None
+    return handle
+
+
+def set_file_times(path: str, created: float, modified: float, accessed: float) -> bool:
+    """Set creation, access and modified times through one Win32 handle.
+    
+    Replaces a set_file_creation_time + os.utime pair, which opens the
+    file twice. Safe to call on non-Windows systems (returns False).
     
     Args:
         path: Path to the file.
-        timestamp: Unix timestamp to apply.
+        created: Unix timestamp for the creation time.
+        modified: Unix timestamp for the modified time.
+        accessed: Unix timestamp for the access time.
         
     Returns:
         True on success, False on failure or non-Windows OS.
@@ -146,29 +239,71 @@ def set_file_creation_time(path: str, timestamp: float) -> bool:
         return False
 
     try:
-        # Convert Unix timestamp to Windows FileTime (100ns intervals since Jan 1, 1601)
-        wintime = int((timestamp * 10000000) + 116444736000000000)
+        handle = _open_for_times(path, _FILE_WRITE_ATTRIBUTES, _FILE_SHARE_ALL)
+        if handle is None:
+            return False
         
-        ft = wintypes.FILETIME()
-        ft.dwLowDateTime = wintime & 0xFFFFFFFF
-        ft.dwHighDateTime = wintime >> 32
+        try:
+            result = _SetFileTime(
+                handle, byref(_to_filetime(created)), byref(_to_filetime(accessed)),
+                byref(_to_filetime(modified))
+            )
+        finally:
+            _CloseHandle(handle)
         
-        GENERIC_WRITE = 0x40000000
-        OPEN_EXISTING = 3
-        FILE_ATTRIBUTE_NORMAL = 0x80
+        return result != 0
+    except Exception:
+        return False
+
+
+def set_file_creation_time(path: str, timestamp: float) -> bool:
+    """Set the Windows Creation Time (Birthtime) to a specific timestamp.
+    
+    Uses Win32 API via ctypes. Safe to call on non-Windows systems (returns False).
+    
+    Args:
+        path: Path to the file.
+        timestamp: Unix timestamp to apply.
         
-        # CreateFileW is the Unicode version
-        handle = windll.kernel32.CreateFileW(
-            path, GENERIC_WRITE, 0, None, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, None
-        )
+    Returns:
+        True on success, False on failure or non-Windows OS.
+    """
+    return set_file_creation_times([(path, timestamp)])[0]
+
+
+def set_file_creation_times(items: list[tuple[str, float]]) -> list[bool]:
+    """Set the Windows Creation Time for many files.
+    
+    Reuses one FILETIME struct and the pre-bound Win32 functions across
+    the whole batch. Safe to call on non-Windows systems (all False).
+    
+    Args:
+        items: (path, Unix timestamp) pairs.
         
-        if handle == -1:
-            return False
+    Returns:
+        One success flag per item, in order.
+    """
+    if os.name != 'nt':
+        return [False] * len(items)
+
+    ft = wintypes.FILETIME()
+    results = []
+    for path, timestamp in items:
+        try:
+            _to_filetime(timestamp, ft)
             
-        # SetFileTime(handle, Creation, Access, Modification) -> We only set Creation here
-        result = windll.kernel32.SetFileTime(handle, byref(ft), None, None)
-        windll.kernel32.CloseHandle(handle)
-        
-        return result != 0
-    except Exception:
-        return False
\ No newline at end of file
+            handle = _open_for_times(path, _GENERIC_WRITE, 0)
+            if handle is None:
+                results.append(False)
+                continue
+            
+            # SetFileTime(handle, Creation, Access, Modification) -> We only set Creation here
+            try:
+                result = _SetFileTime(handle, byref(ft), None, None)
+            finally:
+                _CloseHandle(handle)
+            
+            results.append(result != 0)
+        except Exception:
+            results.append(False)
+    return results
@@ -71,6 +71,7 @@ def db_manager(mock_config):
     yield mgr
     
     # Cleanup
+    mgr.close()
     if os.path.exists(db_path):
         try:
             os.remove(db_path)
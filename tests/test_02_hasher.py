@@ -1,4 +1,10 @@
-from src.hasher import Fingerprinter
+import os
+
+import pytest
+import xxhash
+
+from src import hasher as hasher_module
+from src.hasher import Fingerprinter, HASH_ALGO
 
 def test_hasher_funnel_logic(db_manager, mock_config, temp_roots):
     """
@@ -23,9 +29,8 @@ def test_hasher_funnel_logic(db_manager, mock_config, temp_roots):
     
     # Insert manually to simulate crawler
     with db_manager.get_connection() as conn:
-        for f in src.iterdir():
-            conn.execute("INSERT INTO media_files (file_path, file_size) VALUES (?, ?)", 
-                         (str(f), f.stat().st_size))
+        conn.executemany("INSERT INTO media_files (file_path, file_size) VALUES (?, ?)", 
+                         [(str(f), f.stat().st_size) for f in src.iterdir()])
         conn.commit()
         
     # Run
@@ -83,4 +88,130 @@ def test_zero_byte_file_handling(db_manager, mock_config, temp_roots):
         # xxhash of empty string is a constant, so they must match
         assert res[0][0] == res[1][0]
 
-        
\ No newline at end of file
+        
+def test_partial_hash_cache_reused(db_manager, mock_config, temp_roots):
+    """
+    A file whose path, size and mtime are unchanged gets its partial hash
+    from the cache on the next run instead of being read again.
+    """
+    src = temp_roots["source"]
+    files = [src / "same_1.jpg", src / "same_2.jpg"]
+    files[0].write_bytes(b"E"*3000)
+    files[1].write_bytes(b"F"*3000)
+    
+    with db_manager.get_connection() as conn:
+        conn.executemany("INSERT INTO media_files (file_path, file_size, modified_at) VALUES (?, ?, ?)", 
+                         [(str(f), 3000, f.stat().st_mtime) for f in files])
+        conn.commit()
+    
+    Fingerprinter(db_manager, mock_config).process_database()
+    
+    with db_manager.get_connection() as conn:
+        first = conn.execute("SELECT hash_partial FROM media_files ORDER BY id").fetchall()
+        
+        # Rewrite the content but keep the mtime, then reset the rows
+        stat = files[0].stat()
+        files[0].write_bytes(b"G"*3000)
+        os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        conn.execute("UPDATE media_files SET hash_partial = NULL, hashed = 0")
+        conn.commit()
+    
+    Fingerprinter(db_manager, mock_config).process_database()
+    
+    with db_manager.get_connection() as conn:
+        second = conn.execute("SELECT hash_partial FROM media_files ORDER BY id").fetchall()
+        assert second == first
+
+def test_small_file_partial_reused_as_full(db_manager, mock_config, temp_roots):
+    """
+    Files of at most two chunks are read whole in the partial stage; the
+    full stage takes that digest as hash_full without reading them again.
+    """
+    src = temp_roots["source"]
+    # 1500 bytes: past one 1024-byte chunk, but within two
+    (src / "small_1.jpg").write_bytes(b"H"*1024 + b"x"*476)
+    (src / "small_2.jpg").write_bytes(b"H"*1024 + b"y"*476)
+    (src / "small_3.jpg").write_bytes(b"H"*1024 + b"y"*476)
+    
+    with db_manager.get_connection() as conn:
+        conn.executemany("INSERT INTO media_files (file_path, file_size) VALUES (?, ?)", 
+                         [(str(f), 1500) for f in src.iterdir()])
+        conn.commit()
+    
+    hasher = Fingerprinter(db_manager, mock_config)
+    hasher.process_database()
+    
+    with db_manager.get_connection() as conn:
+        rows = dict(conn.execute("SELECT file_path, hash_full FROM media_files").fetchall())
+        # Differs only after the first chunk, so it must not match the others
+        assert rows[str(src / "small_1.jpg")] is None
+        assert rows[str(src / "small_2.jpg")] is not None
+        assert rows[str(src / "small_2.jpg")] == rows[str(src / "small_3.jpg")]
+        assert rows[str(src / "small_2.jpg")] == hasher._compute_full_hash(str(src / "small_2.jpg"))
+
+def test_full_hash_is_xxh3_of_content(db_manager, mock_config, temp_roots):
+    """
+    Stored full hashes are the raw xxh3_64 digest of the whole file, the
+    algorithm the cache is tagged with.
+    """
+    src = temp_roots["source"]
+    # 3000 bytes: past two chunks, so the full stage reads the file itself
+    content = bytes(range(256)) * 11 + b"tail" * 46
+    (src / "big_1.jpg").write_bytes(content)
+    (src / "big_2.jpg").write_bytes(content)
+    
+    with db_manager.get_connection() as conn:
+        conn.executemany("INSERT INTO media_files (file_path, file_size) VALUES (?, ?)", 
+                         [(str(f), len(content)) for f in src.iterdir()])
+        conn.commit()
+    
+    Fingerprinter(db_manager, mock_config).process_database()
+    
+    assert HASH_ALGO == "xxh3_64"
+    with db_manager.get_connection() as conn:
+        res = conn.execute("SELECT hash_full FROM media_files").fetchall()
+        assert [r[0] for r in res] == [xxhash.xxh3_64_digest(content)] * 2
+
+def test_full_hash_mapped_and_read_paths_agree(db_manager, mock_config, temp_roots):
+    """
+    Files from 1 MiB up are hashed through mmap, smaller ones with a single
+    read; both must give the digest of the content.
+    """
+    src = temp_roots["source"]
+    hasher = Fingerprinter(db_manager, mock_config)
+    for name, size in (("read.jpg", (1 << 20) - 1), ("mapped.jpg", (1 << 20) + 1)):
+        content = bytes(range(256)) * (size // 256) + b"z" * (size % 256)
+        (src / name).write_bytes(content)
+        assert hasher._compute_full_hash(str(src / name)) == xxhash.xxh3_64_digest(content)
+
+def test_unique_sizes_marked_on_large_catalog(db_manager, mock_config, monkeypatch):
+    """
+    Past SMALL_CATALOG_ROWS the unique-size pass runs as one SQL UPDATE;
+    it must mark exactly the rows whose size no other row shares.
+    """
+    monkeypatch.setattr("src.hasher.SMALL_CATALOG_ROWS", 2)
+    with db_manager.get_connection() as conn:
+        conn.executemany("INSERT INTO media_files (file_path, file_size) VALUES (?, ?)",
+                         [("/a.jpg", 10), ("/b.jpg", 20), ("/c.jpg", 20), ("/d.jpg", 30)])
+        hasher = Fingerprinter(db_manager, mock_config)
+        hasher._mark_unique_sizes(conn)
+        hasher.cache.close()
+        res = dict(conn.execute("SELECT file_path, hashed FROM media_files").fetchall())
+    assert res == {"/a.jpg": 1, "/b.jpg": 0, "/c.jpg": 0, "/d.jpg": 1}
+
+def test_full_hash_survives_failing_cache_hints(db_manager, mock_config, temp_roots, monkeypatch):
+    """
+    Page cache hints are best effort; a hint that fails must not turn a
+    successfully read file into "Could not read file".
+    """
+    if not hasher_module._HAS_FADVISE:
+        pytest.skip("posix_fadvise not available")
+    
+    def failing_hint(*args):
+        raise OSError(22, "Invalid argument")
+    monkeypatch.setattr(hasher_module.os, "posix_fadvise", failing_hint)
+    
+    content = b"I" * 5000
+    (temp_roots["source"] / "hinted.jpg").write_bytes(content)
+    hasher = Fingerprinter(db_manager, mock_config)
+    assert hasher._compute_full_hash(str(temp_roots["source"] / "hinted.jpg")) == xxhash.xxh3_64_digest(content)
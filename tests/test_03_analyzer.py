@@ -69,11 +69,10 @@ def test_filename_penalty_tiebreaker(db_manager, mock_config):
     path_c = "C:/Photos/Vacation (1).jpg"
     
     with db_manager.get_connection() as conn:
-        for p in [path_a, path_b, path_c]:
-            conn.execute("""
-                INSERT INTO media_files (file_path, hash_full, created_at, modified_at, metadata_score)
-                VALUES (?, ?, ?, ?, 10)
-            """, (p, hash_val, ts, ts))
+        conn.executemany("""
+            INSERT INTO media_files (file_path, hash_full, created_at, modified_at, metadata_score)
+            VALUES (?, ?, ?, ?, 10)
+        """, [(p, hash_val, ts, ts) for p in [path_a, path_b, path_c]])
         conn.commit()
         
     analyzer = Analyzer(db_manager, mock_config)
@@ -91,3 +90,52 @@ def test_filename_penalty_tiebreaker(db_manager, mock_config):
         res_c = conn.execute("SELECT disposition FROM media_files WHERE file_path=?", (path_c,)).fetchone()
         assert res_c[0] == 'DELETE'
 
+
+def test_jpeg_exif_date_prefers_original(temp_roots):
+    """
+    The JPEG header parser must pick DateTimeOriginal over DateTime, like Pillow.
+    """
+    from PIL import Image
+    from src.analyzer import _extract_exif
+    
+    path = temp_roots["source"] / "camera.jpg"
+    exif = Image.Exif()
+    exif[306] = "2021:03:03 00:00:00"
+    exif.get_ifd(0x8769)[36867] = "2018:05:05 00:00:00"
+    Image.new("RGB", (8, 8)).save(path, exif=exif.tobytes())
+    
+    assert _extract_exif(str(path)) == (1, "2018:05:05 00:00:00")
+    
+    plain = temp_roots["source"] / "plain.jpg"
+    Image.new("RGB", (8, 8)).save(plain)
+    assert _extract_exif(str(plain)) == (0, None)
+
+def test_python_judge_matches_sql_judge(db_manager, mock_config, monkeypatch):
+    """
+    The Python fallback for SQLite without window functions must pick the
+    same winners as _JUDGE_SQL.
+    """
+    ts = 1704067200.0 # 2024-01-01
+    rows = [
+        (f"C:/Set{i}/{name}", f"hash{i % 7}", ts + (i % 3) * 86400, ts + (i % 4) * 3600, (i % 2) * 10)
+        for i, name in enumerate(["a.jpg", "Copy of a.jpg", "a (1).jpg", "longer_name.jpg", "b.jpg"] * 6)
+    ]
+    with db_manager.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO media_files (file_path, hash_full, created_at, modified_at, metadata_score)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    
+    results = []
+    for has_window in (True, False):
+        monkeypatch.setattr("src.analyzer._HAS_WINDOW_FUNCTIONS", has_window)
+        with db_manager.get_connection() as conn:
+            conn.execute("UPDATE media_files SET disposition = NULL")
+            conn.commit()
+        Analyzer(db_manager, mock_config).process_duplicates()
+        with db_manager.get_connection() as conn:
+            results.append(conn.execute("SELECT id, disposition FROM media_files ORDER BY id").fetchall())
+    
+    assert results[0] == results[1]
+    assert sum(d == 'KEEP' for _, d in results[0]) == 7
@@ -1,4 +1,9 @@
-from src.librarian import Librarian
+from datetime import datetime
+
+from src.librarian import (
+    Librarian, compile_filename_template, _clean_folder, _local_date,
+    _DATE_BUCKET_SECONDS, _FOLDER_CLEAN_PATTERN,
+)
 
 def test_librarian_template_logic(db_manager, mock_config):
     """
@@ -106,11 +111,10 @@ def test_librarian_deep_collision(db_manager, mock_config):
     ]
     
     with db_manager.get_connection() as conn:
-        for src in sources:
-            conn.execute("""
-                INSERT INTO media_files (file_path, created_at, modified_at, file_ext, disposition)
-                VALUES (?, ?, ?, '.jpg', 'KEEP')
-            """, (src, ts, ts))
+        conn.executemany("""
+            INSERT INTO media_files (file_path, created_at, modified_at, file_ext, disposition)
+            VALUES (?, ?, ?, '.jpg', 'KEEP')
+        """, [(src, ts, ts) for src in sources])
         conn.commit()
         
     lib = Librarian(db_manager, mock_config)
@@ -135,3 +139,88 @@ def test_librarian_deep_collision(db_manager, mock_config):
         assert any(t.endswith("_Img_3.jpg") for t in target_paths)
         assert any(t.endswith("_Img_4.jpg") for t in target_paths)
 
+
+def test_librarian_collision_ignores_case(db_manager, mock_config):
+    """
+    Names differing only by case collide (NTFS/exFAT targets), including
+    non-ASCII letters, which SQLite's NOCASE collation would not fold.
+    """
+    mock_config["organization"]["filename_template"] = "{date}_{name}"
+    ts = 1704110400.0 # 2024-01-01
+    sources = ["D:/A/Img.jpg", "D:/B/IMG.jpg", "D:/C/Été.jpg", "D:/D/ÉTÉ.jpg"]
+    
+    with db_manager.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO media_files (file_path, created_at, modified_at, file_ext, disposition)
+            VALUES (?, ?, ?, '.jpg', 'KEEP')
+        """, [(src, ts, ts) for src in sources])
+        conn.commit()
+    
+    Librarian(db_manager, mock_config).generate_organization_plan()
+    
+    with db_manager.get_connection() as conn:
+        names = [t[0].rsplit("/", 1)[1] for t in conn.execute("SELECT target_path FROM media_files ORDER BY id")]
+    
+    assert [n.split("_", 1)[1] for n in names] == ["Img.jpg", "IMG_2.jpg", "Été.jpg", "ÉTÉ_2.jpg"]
+
+
+def test_librarian_collisions_stay_unique(db_manager, mock_config):
+    """
+    Names that already look like collision suffixes (Img_2.jpg) must not
+    be handed out twice when many Img.jpg files collide around them.
+    """
+    mock_config["organization"]["filename_template"] = "{date}_{name}"
+    ts = 1704110400.0 # 2024-01-01
+    names = ["Img.jpg", "Img_2.jpg", "IMG_3.jpg", "Img_2_2.jpg"] + ["Img.jpg"] * 200
+    sources = [f"D:/F{i}/{name}" for i, name in enumerate(names)]
+    
+    with db_manager.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO media_files (file_path, created_at, modified_at, file_ext, disposition)
+            VALUES (?, ?, ?, '.jpg', 'KEEP')
+        """, [(src, ts, ts) for src in sources])
+        conn.commit()
+    
+    Librarian(db_manager, mock_config).generate_organization_plan()
+    
+    with db_manager.get_connection() as conn:
+        targets = [t[0].lower() for t in conn.execute("SELECT target_path FROM media_files")]
+    
+    assert len(targets) == len(sources)
+    assert len(set(targets)) == len(sources)
+
+
+def test_compiled_template_matches_format():
+    """
+    Compiled templates produce the same names as str.format; unknown
+    placeholders are rejected so the caller can fall back.
+    """
+    for template in ["{date}_{name}_from_{folder}", "{folder}-{name}", "x'%{{}}_{date}", ""]:
+        fmt = compile_filename_template(template)
+        assert fmt("2024-01-01", "IMG", "Trip") == template.format(date="2024-01-01", name="IMG", folder="Trip")
+    
+    assert compile_filename_template("{date}_{camera}") is None
+
+
+def test_folder_clean_table_matches_pattern():
+    """
+    ASCII folder names are cleaned with a str.translate table; it must
+    agree with the regex that non-ASCII names still go through.
+    """
+    ascii_names = ["Summer VACATION! (2024)", "a-b_c.d", "".join(chr(i) for i in range(128))]
+    for name in ascii_names + ["Été à Paris!", "東京 2024"]:
+        assert _clean_folder(name) == _FOLDER_CLEAN_PATTERN.sub('_', name)
+
+
+def test_bucketed_date_matches_strftime():
+    """
+    Dates are formatted once per _DATE_BUCKET_SECONDS bucket; every
+    timestamp in a bucket must still get its own local date, including
+    around midnight and daylight-saving changes.
+    """
+    start = 1704067200 # 2024-01-01 UTC
+    for ts in range(start, start + 366 * 86400, 86400 // 7 + 13):
+        for offset in (0, 1, 899, 900, 3599):
+            t = ts + offset + 0.5
+            expected = datetime.fromtimestamp(t).strftime("%Y-%m-%d")
+            assert _local_date(int(t // _DATE_BUCKET_SECONDS)) == expected
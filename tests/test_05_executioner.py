@@ -1,4 +1,9 @@
+import errno
 import os
+
+import pytest
+
+from src import executioner
 from src.executioner import Executioner
 
 def test_executioner_receipts(db_manager, mock_config, temp_roots):
@@ -49,4 +54,194 @@ def test_executioner_skips_in_place(db_manager, mock_config, temp_roots):
     
     # Ensure NO trace file created in target root
     trace_file = temp_roots["target"] / "image_trace.txt"
-    assert not trace_file.exists()
\ No newline at end of file
+    assert not trace_file.exists()
+
+def test_executioner_central_receipts(db_manager, mock_config, temp_roots):
+    """
+    Central mode writes one trace log in the target root, not in the source folder.
+    """
+    src_file = temp_roots["source"] / "central_img.jpg"
+    src_file.write_text("content")
+    
+    dest_path = str(temp_roots["target"] / "2024" / "central_img.jpg")
+    
+    with db_manager.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO media_files (file_path, target_path, disposition)
+            VALUES (?, ?, 'KEEP')
+        """, (str(src_file), dest_path))
+        conn.commit()
+    
+    mock_config["organization"]["receipts_mode"] = "central"
+    exec = Executioner(db_manager, mock_config, dry_run=False)
+    exec.execute()
+    
+    assert not (temp_roots["source"] / "image_trace.txt").exists()
+    
+    logs = list(temp_roots["target"].glob("image_trace_*.txt"))
+    assert len(logs) == 1
+    content = logs[0].read_text()
+    assert f"== {os.path.dirname(str(src_file))} ==" in content
+    assert "[MOVED] 'central_img.jpg'" in content
+
+def test_executioner_batches_folder_receipts(db_manager, mock_config, temp_roots):
+    """
+    Several moves out of one folder land in image_trace.txt as a single run block.
+    """
+    with db_manager.get_connection() as conn:
+        for i in range(3):
+            src_file = temp_roots["source"] / f"batch_{i}.jpg"
+            src_file.write_text(f"content {i}")
+            conn.execute("""
+                INSERT INTO media_files (file_path, target_path, disposition)
+                VALUES (?, ?, 'KEEP')
+            """, (str(src_file), str(temp_roots["target"] / "2024" / f"batch_{i}.jpg")))
+        conn.commit()
+    
+    exec = Executioner(db_manager, mock_config, dry_run=False)
+    exec.execute()
+    
+    content = (temp_roots["source"] / "image_trace.txt").read_text()
+    assert content.count("--- Media Consolidator Run:") == 1
+    for i in range(3):
+        assert f"[MOVED] 'batch_{i}.jpg'" in content
+
+def test_move_never_overwrites_target(db_manager, mock_config, temp_roots):
+    """
+    A KEEP whose target is already taken by an unrelated file is refused;
+    both files stay as they were.
+    """
+    src_file = temp_roots["source"] / "incoming.jpg"
+    src_file.write_text("incoming")
+    occupant = temp_roots["target"] / "2024" / "incoming.jpg"
+    occupant.parent.mkdir()
+    occupant.write_text("occupant")
+    
+    with db_manager.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO media_files (file_path, target_path, disposition)
+            VALUES (?, ?, 'KEEP')
+        """, (str(src_file), str(occupant)))
+        conn.commit()
+    
+    exec = Executioner(db_manager, mock_config, dry_run=False)
+    exec.execute()
+    
+    assert src_file.read_text() == "incoming"
+    assert occupant.read_text() == "occupant"
+    assert not (temp_roots["source"] / "image_trace.txt").exists()
+
+def test_zero_copy_move_without_hard_links(temp_roots, monkeypatch):
+    """
+    Where the filesystem has no hard links, the checked rename fallback
+    still moves the file and still refuses an existing destination.
+    """
+    def no_links(*args, **kwargs):
+        raise OSError(errno.EPERM, "Operation not permitted")
+    monkeypatch.setattr(executioner.os, "link", no_links)
+    
+    src_file = temp_roots["source"] / "a.jpg"
+    src_file.write_text("a")
+    dst_file = temp_roots["target"] / "a.jpg"
+    executioner._zero_copy_move(str(src_file), str(dst_file))
+    assert dst_file.read_text() == "a" and not src_file.exists()
+    
+    src_file.write_text("b")
+    with pytest.raises(FileExistsError):
+        executioner._zero_copy_move(str(src_file), str(dst_file))
+    assert dst_file.read_text() == "a" and src_file.read_text() == "b"
+
+def test_executioner_moves_chained_keepers_in_order(db_manager, mock_config, temp_roots):
+    """
+    A keeper planned into the slot another keeper is leaving waits until
+    that slot is free; neither file is lost.
+    """
+    organized = temp_roots["target"] / "2023" / "photo.jpg"
+    organized.parent.mkdir()
+    organized.write_text("already organized")
+    replanned = temp_roots["target"] / "2024" / "photo.jpg"
+    incoming = temp_roots["source"] / "photo.jpg"
+    incoming.write_text("incoming")
+    
+    with db_manager.get_connection() as conn:
+        # Lower id first, as when the target root is scanned first
+        conn.executemany("""
+            INSERT INTO media_files (file_path, target_path, disposition)
+            VALUES (?, ?, 'KEEP')
+        """, [(str(organized), str(replanned)), (str(incoming), str(organized))])
+        conn.commit()
+    
+    exec = Executioner(db_manager, mock_config, dry_run=False)
+    exec.execute()
+    
+    assert replanned.read_text() == "already organized"
+    assert organized.read_text() == "incoming"
+    assert not incoming.exists()
+
+def test_executioner_keeper_waits_for_trashed_duplicate(db_manager, mock_config, temp_roots):
+    """
+    A keeper planned onto a file that is going to the trash moves in after
+    the delete phase has cleared the slot.
+    """
+    slot = temp_roots["target"] / "2024" / "dup.jpg"
+    slot.parent.mkdir()
+    slot.write_text("duplicate")
+    incoming = temp_roots["source"] / "dup.jpg"
+    incoming.write_text("duplicate")
+    
+    with db_manager.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO media_files (file_path, hash_full, disposition)
+            VALUES (?, 'h', 'DELETE')
+        """, (str(slot),))
+        conn.execute("""
+            INSERT INTO media_files (file_path, hash_full, target_path, disposition)
+            VALUES (?, 'h', ?, 'KEEP')
+        """, (str(incoming), str(slot)))
+        conn.commit()
+    
+    exec = Executioner(db_manager, mock_config, dry_run=False)
+    exec.execute()
+    
+    assert slot.read_text() == "duplicate"
+    assert not incoming.exists()
+    assert len(list(temp_roots["trash"].iterdir())) == 1
+
+def test_split_keeper_moves_orders_chains():
+    """
+    Waiting moves come out so that each target is vacated before it is filled.
+    """
+    rows = [
+        (1, "/s/c", "/s/d", 0, 0),   # c -> d, d is itself moving on
+        (2, "/s/a", "/s/b", 0, 0),   # a -> b, b is moving on
+        (3, "/s/b", "/s/c", 0, 0),   # b -> c, c is moving on
+        (4, "/s/d", "/s/e", 0, 0),   # d -> e, e is free
+        (5, "/s/x", "/s/y", 0, 0),   # y is a duplicate going to the trash
+    ]
+    independent, waiting = executioner._split_keeper_moves(rows, {executioner._path_key("/s/y")})
+    assert [r[0] for r in independent] == [4]
+    assert [r[0] for r in waiting] == [1, 3, 2, 5]
+
+def test_zero_copy_move_across_drives_keeps_mode_and_mtime(temp_roots, monkeypatch):
+    """
+    The cross-drive copy path keeps the source's permission bits and
+    modified time instead of the mode a fresh file would get.
+    """
+    def cross_device(*args, **kwargs):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(executioner.os, "link", cross_device)
+    monkeypatch.setattr(executioner.os, "rename", cross_device)
+    
+    src_file = temp_roots["source"] / "shared.jpg"
+    src_file.write_text("content")
+    os.chmod(src_file, 0o640)
+    os.utime(src_file, ns=(1_600_000_000_000_000_000, 1_500_000_000_000_000_000))
+    src_mode = src_file.stat().st_mode
+    
+    dst_file = temp_roots["target"] / "shared.jpg"
+    executioner._zero_copy_move(str(src_file), str(dst_file))
+    
+    assert not src_file.exists()
+    assert dst_file.read_text() == "content"
+    assert dst_file.stat().st_mode == src_mode
+    assert dst_file.stat().st_mtime_ns == 1_500_000_000_000_000_000
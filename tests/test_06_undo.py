@@ -0,0 +1,206 @@
+import logging
+import sys
+
+import pytest
+
+import undo
+from src.db import DatabaseManager
+
+@pytest.fixture
+def undo_env(tmp_path, monkeypatch):
+    """
+    A finished run to undo: a config naming the trash folder and an index
+    database, with undo.py pointed at both.
+    Returns a function that inserts media_files rows.
+    """
+    trash = tmp_path / "trash"
+    trash.mkdir()
+    config_path = tmp_path / "settings.yaml"
+    config_path.write_text(f"organization:\n  trash_folder: {trash.as_posix()}\n")
+    db_path = str(tmp_path / "media_index.db")
+
+    monkeypatch.setattr(undo, "CONFIG_PATH", str(config_path))
+    monkeypatch.setattr(undo, "DB_PATH", db_path)
+
+    mgr = DatabaseManager(db_path)
+    mgr.initialize_schema()
+
+    def add_rows(rows):
+        with mgr.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO media_files (id, file_path, target_path, disposition)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+
+    yield add_rows
+    mgr.close()
+
+def run_undo(monkeypatch, caplog, live):
+    """
+    Runs undo.py's main() and returns the original paths it restored (or,
+    in a dry run, previewed), in order.
+    """
+    monkeypatch.setattr(sys, "argv", ["undo.py"] + (["--live"] if live else []))
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger="UndoManager"):
+        undo.main()
+    prefix = "[RESTORED] -> " if live else "[DRY] Restore: "
+    return [
+        r.getMessage().rsplit(" -> ", 1)[1]
+        for r in caplog.records if r.getMessage().startswith(prefix)
+    ]
+
+def test_undo_restores_chain_in_order(undo_env, tmp_path, monkeypatch, caplog):
+    """
+    Keeper A's original path is keeper B's target (B was moved into the
+    slot A left), so B has to be restored out of it before A can go back.
+    """
+    slot = tmp_path / "organized" / "2023" / "photo.jpg"   # A's original, B's target
+    a_target = tmp_path / "organized" / "2024" / "photo.jpg"
+    b_orig = tmp_path / "source" / "photo.jpg"
+    slot.parent.mkdir(parents=True)
+    a_target.parent.mkdir(parents=True)
+    slot.write_text("B")
+    a_target.write_text("A")
+    undo_env([
+        (1, str(slot), str(a_target), "KEEP"),
+        (2, str(b_orig), str(slot), "KEEP"),
+    ])
+
+    restored = run_undo(monkeypatch, caplog, live=True)
+
+    assert restored == [str(b_orig), str(slot)]
+    assert b_orig.read_text() == "B"
+    assert slot.read_text() == "A"
+    assert not a_target.exists()
+
+def test_undo_restores_trashed_duplicate_into_reused_slot(undo_env, tmp_path, monkeypatch, caplog):
+    """
+    A duplicate went to the trash and a keeper took its path; the keeper
+    is restored first, then the duplicate comes back to its own path.
+    """
+    slot = tmp_path / "organized" / "dup.jpg"
+    keeper_orig = tmp_path / "source" / "dup.jpg"
+    slot.parent.mkdir(parents=True)
+    slot.write_text("keeper")
+    (tmp_path / "trash" / "1_dup.jpg").write_text("duplicate")
+    undo_env([
+        (1, str(slot), None, "DELETE"),
+        (2, str(keeper_orig), str(slot), "KEEP"),
+    ])
+
+    restored = run_undo(monkeypatch, caplog, live=True)
+
+    assert restored == [str(keeper_orig), str(slot)]
+    assert keeper_orig.read_text() == "keeper"
+    assert slot.read_text() == "duplicate"
+    assert not (tmp_path / "trash" / "1_dup.jpg").exists()
+
+def test_undo_refuses_swap_cycle(undo_env, tmp_path, monkeypatch, caplog):
+    """
+    Two keepers that swapped places cannot be restored in any order; the
+    restores are refused and neither file is overwritten.
+    """
+    x = tmp_path / "x.jpg"
+    y = tmp_path / "y.jpg"
+    x.write_text("was at y")
+    y.write_text("was at x")
+    undo_env([
+        (1, str(x), str(y), "KEEP"),
+        (2, str(y), str(x), "KEEP"),
+    ])
+
+    restored = run_undo(monkeypatch, caplog, live=True)
+
+    assert restored == []
+    assert x.read_text() == "was at y"
+    assert y.read_text() == "was at x"
+    assert any("Target already exists" in r.getMessage() for r in caplog.records)
+
+def test_dir_index_missing_directory_is_empty(tmp_path):
+    """
+    A folder that does not exist lists as empty: nothing in it exists yet.
+    """
+    index = undo.DirIndex()
+    assert not index.exists(str(tmp_path / "gone" / "photo.jpg"))
+    assert index._names(str(tmp_path / "gone")) == set()
+
+def test_dir_index_unreadable_directory_counts_as_occupied(tmp_path, monkeypatch):
+    """
+    A folder that cannot be listed for any other reason reports every name
+    as present, so nothing is restored into it unchecked.
+    """
+    locked = tmp_path / "locked"
+    locked.mkdir()
+    real_scandir = undo.os.scandir
+
+    def scandir(path):
+        if path == str(locked):
+            raise PermissionError(13, "Permission denied", path)
+        return real_scandir(path)
+    monkeypatch.setattr(undo.os, "scandir", scandir)
+
+    index = undo.DirIndex()
+    assert index.exists(str(locked / "photo.jpg"))
+    # A path below a file cannot be listed either
+    blocker = tmp_path / "file.jpg"
+    blocker.write_text("x")
+    assert index.exists(str(blocker / "photo.jpg"))
+    # add/discard leave the unreadable marker alone
+    index.discard(str(locked / "photo.jpg"))
+    assert index.exists(str(locked / "photo.jpg"))
+
+def test_dir_index_dangling_symlink_is_present(tmp_path):
+    """
+    Entries are not followed, so a link to a missing file still occupies
+    its name.
+    """
+    link = tmp_path / "photo.jpg"
+    try:
+        link.symlink_to(tmp_path / "missing.jpg")
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks not available")
+    assert undo.DirIndex().exists(str(link))
+
+def test_dir_index_tracks_moves(tmp_path):
+    """
+    After perform_move the listing shows the file at its new path only,
+    without listing the folders again.
+    """
+    src = tmp_path / "organized" / "photo.jpg"
+    dst = tmp_path / "source" / "photo.jpg"
+    src.parent.mkdir()
+    dst.parent.mkdir()
+    src.write_text("content")
+
+    index = undo.DirIndex()
+    assert index.exists(str(src)) and not index.exists(str(dst))
+    assert undo.perform_move(str(src), str(dst), logging.getLogger("UndoManager"), index)
+    assert not index.exists(str(src)) and index.exists(str(dst))
+    assert dst.read_text() == "content"
+
+def test_dry_run_previews_chain_in_live_order(undo_env, tmp_path, monkeypatch, caplog):
+    """
+    The dry run records its simulated moves in the index, so a restore
+    waiting on a reused path is previewed in the order the live run uses,
+    instead of being reported as blocked.
+    """
+    slot = tmp_path / "organized" / "2023" / "photo.jpg"
+    a_target = tmp_path / "organized" / "2024" / "photo.jpg"
+    b_orig = tmp_path / "source" / "photo.jpg"
+    slot.parent.mkdir(parents=True)
+    a_target.parent.mkdir(parents=True)
+    slot.write_text("B")
+    a_target.write_text("A")
+    undo_env([
+        (1, str(slot), str(a_target), "KEEP"),
+        (2, str(b_orig), str(slot), "KEEP"),
+    ])
+
+    previewed = run_undo(monkeypatch, caplog, live=False)
+    assert not any("Target already exists" in r.getMessage() for r in caplog.records)
+    assert slot.read_text() == "B" and a_target.exists()
+
+    restored = run_undo(monkeypatch, caplog, live=True)
+    assert previewed == restored == [str(b_orig), str(slot)]
@@ -1,16 +1,131 @@
 import os
+import errno
 import shutil
 import logging
 import sqlite3
 import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from src.utils import load_config, setup_logger
 
 # --- CONFIG ---
 DB_PATH = "media_index.db"
 CONFIG_PATH = "config/settings.yaml"
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4) # Restores are I/O bound; threads overlap them
+FETCH_BATCH = 1024 # Rows pulled from the cursor per round of restores
+# Read-side tuning matching the pipeline's connection; query_only also
+# guards the index against accidental writes
+READ_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+# Path comparisons in SQL follow the filesystem: case-blind on Windows
+PATH_COLLATE = " COLLATE NOCASE" if os.name == 'nt' else ""
 # --------------
 
+class DirIndex:
+    """
+    Answers "does this file exist?" from one scandir per directory instead
+    of one stat per file. Listings are kept current as files are moved.
+    Entries are not followed, so a dangling symlink still counts as present.
+    """
+    # Stored for folders that could not be listed for any reason other than
+    # not existing: everything in them is treated as present, so a restore
+    # never writes into a place it could not check
+    UNREADABLE = None
+
+    def __init__(self):
+        self._dirs = {}
+
+    def _names(self, dirname):
+        try:
+            return self._dirs[dirname]
+        except KeyError:
+            pass
+        try:
+            with os.scandir(dirname or ".") as it:
+                names = {os.path.normcase(entry.name) for entry in it}
+        except FileNotFoundError:
+            # Missing folder: nothing in it exists (yet)
+            names = set()
+        except OSError:
+            names = self.UNREADABLE
+        # Safe across restore threads: if two list the same folder at
+        # once, both keep whichever listing was stored first
+        return self._dirs.setdefault(dirname, names)
+
+    def exists(self, path):
+        dirname, name = os.path.split(path)
+        names = self._names(dirname)
+        return names is self.UNREADABLE or os.path.normcase(name) in names
+
+    def add(self, path):
+        dirname, name = os.path.split(path)
+        names = self._names(dirname)
+        if names is not self.UNREADABLE:
+            names.add(os.path.normcase(name))
+
+    def discard(self, path):
+        dirname, name = os.path.split(path)
+        names = self._names(dirname)
+        if names is not self.UNREADABLE:
+            names.discard(os.path.normcase(name))
+
+def order_blocked(rows):
+    """
+    Orders blocked restores so each runs after the keeper occupying its
+    original path has been restored out of it.
+    Rows are (kind, original path, location, blocked); only 'K' rows
+    occupy a path (their location, the organized copy). A cycle cannot be
+    satisfied by any order; it is cut and the restore that still finds
+    its target taken is refused.
+    """
+    by_location = {os.path.normcase(row[2]): row for row in rows if row[0] == 'K'}
+    ordered, seen = [], set()
+    for row in rows:
+        # Walk back to the restore that frees the chain, then emit it first
+        chain = []
+        current = row
+        while current is not None and id(current) not in seen:
+            seen.add(id(current))
+            chain.append(current)
+            current = by_location.get(os.path.normcase(current[1]))
+        ordered.extend(reversed(chain))
+    return ordered
+
+def restore_all(cursor, restore, logger, max_workers=MAX_WORKERS):
+    """
+    Streams rows from cursor through restore on a thread pool.
+    Only FETCH_BATCH rows are held at a time, so memory stays flat however
+    large the run was. Rows flagged as blocked (fourth column) are held
+    back and restored one at a time after the pool drains, in the order
+    order_blocked gives. Progress is logged once per batch rather than per
+    file. Rows are tallied by their first column (the kind tag); returns
+    (rows seen, rows restored) as Counters.
+    """
+    totals, restored = Counter(), Counter()
+    blocked = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            free = [row for row in rows if not row[3]]
+            blocked += [row for row in rows if row[3]]
+            for row, ok in zip(free, executor.map(restore, free)):
+                totals[row[0]] += 1
+                restored[row[0]] += ok
+            logger.info(f"Progress: {sum(restored.values())}/{sum(totals.values())} files restored")
+    
+    if blocked:
+        logger.info(f"Restoring {len(blocked)} files whose original path was reused, in order...")
+    for row in order_blocked(blocked):
+        totals[row[0]] += 1
+        restored[row[0]] += restore(row)
+    return totals, restored
+
 def main():
     parser = argparse.ArgumentParser(description="Undo the last MediaConsolidator run.")
     parser.add_argument("--live", action="store_true", help="Actually move files back.")
@@ -45,73 +160,115 @@ def main():
     if not args.live:
         logger.info("Run with '--live' to actually perform operations.")
 
-    conn = sqlite3.connect(DB_PATH)
+    # Autocommit: undo only reads, so sqlite3 has no transactions to manage
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
     cursor = conn.cursor()
 
-    # 1. UNDO KEEPERS (Organized -> Source)
-    logger.info("--- Restoring KEEPERS ---")
-    cursor.execute("SELECT file_path, target_path FROM media_files WHERE disposition='KEEP' AND target_path IS NOT NULL")
-    keepers = cursor.fetchall()
+    # One pass restores both kinds: 'K' rows carry the organized location,
+    # 'D' rows the id the trash copy was named with. A row is blocked when
+    # its original path is where another keeper was moved to: that keeper
+    # has to be restored out of the way first.
+    logger.info("--- Restoring KEEPERS and DELETED ---")
+    reused = f"""file_path{PATH_COLLATE} IN (
+            SELECT target_path FROM media_files
+            WHERE disposition='KEEP' AND target_path IS NOT NULL
+            AND target_path != file_path
+        )"""
+    cursor.execute(f"""
+        SELECT 'K', file_path, target_path, {reused} FROM media_files
+        WHERE disposition='KEEP' AND target_path IS NOT NULL
+        UNION ALL
+        SELECT 'D', file_path, id, {reused} FROM media_files
+        WHERE disposition='DELETE'
+    """)
     
-    restored_keepers = 0
-    for original_src, current_loc in keepers:
-        # Check if the file is actually where we put it
-        if not os.path.exists(current_loc):
-            # It might be missing because we just moved it? No, loop hasn't run.
-            # It might be missing because the user moved it manually.
-            logger.warning(f"Missing expected file in Organized: {current_loc}")
-            continue
-            
-        if perform_move(current_loc, original_src, logger, args.live):
-            restored_keepers += 1
+    index = DirIndex()
+    # Same path os.path.join(trash_root, name) gives, joined once up front
+    trash_prefix = os.path.join(trash_root, "")
+    # Live or dry run is decided once here, not re-checked for every file
+    move = perform_move if args.live else preview_move
 
-    # 2. UNDO DELETES (Trash -> Source)
-    logger.info("--- Restoring DELETED ---")
-    cursor.execute("SELECT id, file_path FROM media_files WHERE disposition='DELETE'")
-    deletes = cursor.fetchall()
-    
-    restored_deletes = 0
-    for row_id, original_src in deletes:
-        filename = os.path.basename(original_src)
-        # Reconstruct how Executioner named it: {ID}_{Filename}
-        trash_filename = f"{row_id}_{filename}"
-        current_loc = os.path.join(trash_root, trash_filename)
-        
-        if not os.path.exists(current_loc):
-            logger.warning(f"Missing expected file in Trash: {current_loc}")
-            continue
+    def restore(row):
+        kind, original_src, location, _ = row
+        if kind == 'K':
+            # Check if the file is actually where we put it
+            current_loc = location
+            if not index.exists(current_loc):
+                # It might be missing because the user moved it manually.
+                logger.warning(f"Missing expected file in Organized: {current_loc}")
+                return False
+        else:
+            filename = os.path.basename(original_src)
+            # Reconstruct how Executioner named it: {ID}_{Filename}
+            current_loc = f"{trash_prefix}{location}_{filename}"
             
-        if perform_move(current_loc, original_src, logger, args.live):
-            restored_deletes += 1
+            if not index.exists(current_loc):
+                logger.warning(f"Missing expected file in Trash: {current_loc}")
+                return False
+        return move(current_loc, original_src, logger, index)
+
+    # Unblocked restores never touch a path another restore reads or
+    # writes, so they run concurrently (renames and cross-drive copies
+    # release the GIL); blocked ones follow serially, in dependency order
+    totals, restored = restore_all(cursor, restore, logger)
 
     conn.close()
     
     logger.info("--- UNDO SUMMARY ---")
-    logger.info(f"Keepers Restored: {restored_keepers}/{len(keepers)}")
-    logger.info(f"Deletes Restored: {restored_deletes}/{len(deletes)}")
+    logger.info(f"Keepers Restored: {restored['K']}/{totals['K']}")
+    logger.info(f"Deletes Restored: {restored['D']}/{totals['D']}")
     
     if args.live:
         logger.info("The database is now out of sync with reality. You should delete 'media_index.db'.")
 
-def perform_move(current_path, target_path, logger, is_live):
+def target_taken(target_path, logger, index):
     """
-    Moves file from current_path back to target_path (original location).
+    Safety check shared by both movers: never overwrite something that
+    already exists at the original location (looked up in index, a DirIndex).
     """
-    # Safety: Don't overwrite if something exists at origin
-    if os.path.exists(target_path):
+    if index.exists(target_path):
         logger.warning(f"Cannot restore: Target already exists: {target_path}")
+        return True
+    return False
+
+def preview_move(current_path, target_path, logger, index):
+    """
+    Dry-run mover: reports the restore perform_move would do, touching nothing.
+    """
+    if target_taken(target_path, logger, index):
         return False
+    logger.info(f"[DRY] Restore: ...{os.path.basename(current_path)} -> {target_path}")
+    # Track the simulated move, so a restore waiting on this path
+    # previews the way it would run live
+    index.discard(current_path)
+    index.add(target_path)
+    return True
 
-    if not is_live:
-        logger.info(f"[DRY] Restore: ...{os.path.basename(current_path)} -> {target_path}")
-        return True
+def perform_move(current_path, target_path, logger, index):
+    """
+    Moves file from current_path back to target_path (original location).
+    """
+    if target_taken(target_path, logger, index):
+        return False
 
     try:
         # Ensure parent folder exists (in case user deleted empty source folders)
         os.makedirs(os.path.dirname(target_path), exist_ok=True)
         
-        shutil.move(current_path, target_path)
-        logger.info(f"[RESTORED] -> {target_path}")
+        try:
+            # Same volume (the usual case): a single rename syscall
+            os.rename(current_path, target_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Crossing drives: shutil copies then removes the source
+            shutil.move(current_path, target_path)
+        index.discard(current_path)
+        index.add(target_path)
+        # Per-file detail only at DEBUG; restore_all logs batch progress
+        logger.debug(f"[RESTORED] -> {target_path}")
         return True
     except Exception as e:
         logger.error(f"Failed to move {current_path}: {e}")